@@ -2,14 +2,37 @@
 """
 Password Encryption Module
 """
+import os
+import time
 import bcrypt
 
 
+def calibrate_rounds(target: float = 0.25, min_rounds: int = 12,
+                     max_rounds: int = 16) -> int:
+    """
+    Picks the largest bcrypt cost hashing in about `target` seconds,
+    never below bcrypt's default cost of 12.
+    """
+    probe = 6
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(probe))
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    rounds = probe
+    while elapsed * 2 ** (rounds + 1 - probe) <= target:
+        rounds += 1
+    return max(min_rounds, min(max_rounds, rounds))
+
+
+BCRYPT_ROUNDS = (int(os.getenv("BCRYPT_ROUNDS", 0)) or
+                 calibrate_rounds(float(os.getenv("BCRYPT_TARGET_MS", 250)) /
+                                  1000))
+
+
 def hash_password(password: str) -> bytes:
     """
     Hashes a password using bcrypt.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password.encode(), salt)
     return hashed_password
 
@@ -19,3 +42,13 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     Validates a password against a hashed password.
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """
+    Checks if a hash was made at a lower cost than BCRYPT_ROUNDS.
+    """
+    try:
+        return int(hashed_password.split(b"$")[2]) < BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return True
@@ -2,10 +2,17 @@
 """
 Filtered Logger Module
 """
-from typing import List, Tuple
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
 import re
 import logging
+import multiprocessing
 import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
 import mysql.connector
 from mysql.connector import connection
 
@@ -20,12 +27,112 @@ class RedactingFormatter(logging.Formatter):
     def __init__(self, fields: List[str]):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.redactor = Redactor(fields, self.REDACTION, self.SEPARATOR)
 
     def format(self, record: logging.LogRecord) -> str:
         """Formats log record to redact specified fields."""
         message = super(RedactingFormatter, self).format(record)
-        return filter_datum(self.fields, self.REDACTION,
-                            message, self.SEPARATOR)
+        return self.redactor.redact(message)
+
+
+class Redactor:
+    """Redacts a fixed set of fields with regexes compiled once."""
+
+    def __init__(self, fields: List[str], redaction: str, separator: str):
+        value = f'=[^{re.escape(separator)}]+'
+        escaped = redaction.replace('\\', r'\\')
+        self.patterns = [(re.compile(re.escape(field) + value),
+                          f'{field}={escaped}') for field in fields]
+
+    def redact(self, message: str) -> str:
+        """Obfuscates the configured fields in a log message."""
+        for pattern, replacement in self.patterns:
+            message = pattern.sub(replacement, message)
+        return message
+
+
+class AsyncHandler(logging.Handler):
+    """Queues records and formats/writes them in batches on a thread.
+
+    `full_policy` decides what emit() does when the queue is full:
+    "block" waits for room, "drop" discards the record and "sample"
+    keeps one record out of every `sample_rate` and drops the rest.
+    """
+
+    POLICIES = ("block", "drop", "sample")
+
+    def __init__(self, stream=None, maxsize: int = 10000,
+                 batch_size: int = 512, full_policy: str = "block",
+                 sample_rate: int = 10):
+        super(AsyncHandler, self).__init__()
+        if full_policy not in self.POLICIES:
+            raise ValueError(f"Unknown full_policy {full_policy}")
+        self.stream = stream if stream is not None else sys.stderr
+        self.batch_size = max(1, batch_size)
+        self.full_policy = full_policy
+        self.sample_rate = max(1, sample_rate)
+        self.dropped = 0
+        self._overflow = 0
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._drain,
+                                        name="user_data-logger",
+                                        daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Enqueues a record without formatting it."""
+        if self._thread is None:
+            return
+        if self.full_policy == "block":
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            self._overflow += 1
+        if (self.full_policy == "sample" and
+                self._overflow % self.sample_rate == 0):
+            self._queue.put(record)
+        else:
+            self.dropped += 1
+
+    def _drain(self) -> None:
+        """Formats and writes queued records until a stop sentinel."""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self.stream.write("".join(
+                        self.format(record) + "\n" for record in records))
+                    self.stream.flush()
+            except Exception:
+                for record in records:
+                    self.handleError(record)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(records) < len(batch):
+                return
+
+    def flush(self) -> None:
+        """Blocks until every queued record has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flushes pending records and stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        super(AsyncHandler, self).close()
 
 
 def filter_datum(fields: List[str], redaction: str,
@@ -38,21 +145,38 @@ def filter_datum(fields: List[str], redaction: str,
 
 
 PII_FIELDS: Tuple[str, ...] = ("name", "email", "phone", "ssn", "password")
+USER_COLUMNS: Tuple[str, ...] = ("name", "email", "phone", "ssn", "password",
+                                 "ip", "last_login", "user_agent")
+
 
+def get_logger(asynchronous: bool = False,
+               full_policy: str = "block") -> logging.Logger:
+    """Creates a logger with a redacting formatter.
 
-def get_logger() -> logging.Logger:
-    """Creates a logger with a redacting formatter."""
+    With `asynchronous`, redaction and writes happen on a background
+    thread, see AsyncHandler for the `full_policy` options.
+    """
     logger = logging.getLogger("user_data")
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    handler = logging.StreamHandler()
+    if asynchronous:
+        handler = AsyncHandler(full_policy=full_policy)
+    else:
+        handler = logging.StreamHandler()
     handler.setFormatter(RedactingFormatter(fields=PII_FIELDS))
     logger.addHandler(handler)
     return logger
 
 
 def get_db() -> connection.MySQLConnection:
-    """Returns a MySQL database connection."""
+    """Returns a MySQL database connection.
+
+    If PERSONAL_DATA_DB_SQLITE is set, a connection to that SQLite file
+    is returned instead, as an offline stand-in with a `users` table.
+    """
+    sqlite_path = os.getenv("PERSONAL_DATA_DB_SQLITE")
+    if sqlite_path:
+        return sqlite3.connect(sqlite_path, check_same_thread=False)
     username = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
     password = os.getenv("PERSONAL_DATA_DB_PASSWORD", "")
     host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
@@ -65,22 +189,304 @@ def get_db() -> connection.MySQLConnection:
     )
 
 
+class ConnectionPool:
+    """Pool of reusable get_db() connections.
+
+    Connections are health checked on checkout and closed once they sat
+    idle for more than `idle_timeout` seconds. Use `with pool.connection()
+    as db:` to check a connection out and return it.
+    """
+
+    def __init__(self, factory=None, size: int = 5,
+                 idle_timeout: float = 300.0, timeout: float = None):
+        self.factory = factory if factory is not None else get_db
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def _healthy(db) -> bool:
+        """Checks that a connection still answers a trivial query."""
+        try:
+            cursor = db.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(db) -> None:
+        """Closes a connection, ignoring errors from a dead one."""
+        try:
+            db.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Checks a healthy connection out, opening one if needed.
+
+        Raises TimeoutError if all `size` connections stay busy for
+        longer than `timeout` seconds. The lock only guards the pool's
+        bookkeeping: health checks, closes and connects run outside it
+        so a slow or dead server never stalls other checkouts.
+        """
+        deadline = (None if self.timeout is None
+                    else time.monotonic() + self.timeout)
+        while True:
+            candidate = None
+            with self._cond:
+                while not self._idle and self._created >= self.size:
+                    remaining = (None if deadline is None
+                                 else deadline - time.monotonic())
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(
+                            "No database connection available")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    self._created += 1
+            if candidate is None:
+                try:
+                    return self.factory()
+                except Exception:
+                    self._forget()
+                    raise
+            db, last_used = candidate
+            if (time.monotonic() - last_used <= self.idle_timeout
+                    and self._healthy(db)):
+                return db
+            self._discard(db)
+            self._forget()
+
+    def _forget(self) -> None:
+        """Frees the slot of a connection that was closed or never made."""
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def release(self, db) -> None:
+        """Returns a checked out connection to the pool."""
+        with self._cond:
+            self._idle.append((db, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager checking a connection out and back in."""
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def close(self) -> None:
+        """Closes every idle connection."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify(len(idle))
+        for db, _ in idle:
+            self._discard(db)
+
+
+_pool = None
+_pool_pid = None
+
+
+def get_pool() -> ConnectionPool:
+    """Returns this process' shared ConnectionPool of get_db() connections.
+
+    Sized by PERSONAL_DATA_DB_POOL_SIZE and PERSONAL_DATA_DB_POOL_IDLE.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        try:
+            size = int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", 5))
+            idle = float(os.getenv("PERSONAL_DATA_DB_POOL_IDLE", 300))
+        except ValueError:
+            size, idle = 5, 300.0
+        _pool = ConnectionPool(get_db, size, idle)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def _placeholder(db) -> str:
+    """Returns the query parameter marker used by the db driver."""
+    return "?" if isinstance(db, sqlite3.Connection) else "%s"
+
+
+def stream_users(db, batch_size: int = 1000, key: str = None,
+                 low=None, high=None) -> Iterator[List[str]]:
+    """Yields batches of formatted `users` rows, fetched `batch_size`
+    at a time from an unbuffered cursor so memory stays constant.
+
+    With `key`, only rows with `low <= key < high` are returned, in key
+    order; a None bound is open and `low=None` also covers NULL keys.
+    """
+    template = "; ".join(f"{column}={{}}" for column in USER_COLUMNS) + ";"
+    query = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+    params = []
+    if key is not None:
+        if key not in USER_COLUMNS:
+            raise ValueError(f"Unknown key column {key}")
+        marker = _placeholder(db)
+        clauses = []
+        if low is not None:
+            clauses.append(f"{key} >= {marker}")
+            params.append(low)
+        if high is not None:
+            clauses.append(f"{key} < {marker}")
+            params.append(high)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        if low is None and clauses:
+            query += f" OR {key} IS NULL"
+        query += f" ORDER BY {key}"
+    cursor = db.cursor()
+    try:
+        cursor.execute(query + ";", tuple(params))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [template.format(*row) for row in rows]
+    finally:
+        cursor.close()
+
+
+def partition_users(db, partitions: int, key: str = "email",
+                    batch_size: int = 10000) -> List[tuple]:
+    """Splits the `users` table into `partitions` contiguous key ranges
+    of roughly equal size, returned as (low, high) bounds.
+
+    All bounds come from a single ordered scan of the key column, read
+    `batch_size` keys at a time and cut short after the last bound.
+    """
+    if key not in USER_COLUMNS:
+        raise ValueError(f"Unknown key column {key}")
+    marker = _placeholder(db)
+    partitions = max(1, partitions)
+    cursor = db.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM users WHERE {key} "
+                       f"IS NOT NULL;")
+        total = cursor.fetchone()[0]
+        offsets = [total * i // partitions for i in range(1, partitions)]
+        bounds = []
+        if offsets:
+            cursor.execute(f"SELECT {key} FROM users WHERE {key} IS NOT "
+                           f"NULL ORDER BY {key} LIMIT {marker};",
+                           (offsets[-1] + 1,))
+            position = 0
+            wanted = iter(offsets)
+            target = next(wanted)
+            while target is not None:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                while target is not None and target < position + len(rows):
+                    value = rows[target - position][0]
+                    if not bounds or value > bounds[-1]:
+                        bounds.append(value)
+                    target = next(wanted, None)
+                position += len(rows)
+            # unbuffered cursors must be drained before they are reused
+            while cursor.fetchmany(batch_size):
+                pass
+    finally:
+        cursor.close()
+    edges = [None] + bounds + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _export_partition(args: tuple) -> str:
+    """Process pool worker: redacts one key range on a pooled connection.
+
+    Returns the formatted lines, or writes them to `shard` if given and
+    returns the shard path.
+    """
+    key, low, high, batch_size, shard = args
+    formatter = RedactingFormatter(fields=PII_FIELDS)
+    lines = []
+    out = open(shard, "w") if shard else None
+    try:
+        with get_pool().connection() as db:
+            for messages in stream_users(db, batch_size, key, low, high):
+                text = "".join(formatter.format(logging.LogRecord(
+                    "user_data", logging.INFO, __file__, 0, message, None,
+                    None)) + "\n" for message in messages)
+                if out is not None:
+                    out.write(text)
+                else:
+                    lines.append(text)
+    finally:
+        if out is not None:
+            out.close()
+    return shard if shard else "".join(lines)
+
+
+def parallel_export(stream=None, workers: int = None, key: str = "email",
+                    batch_size: int = 1000, partitions: int = None,
+                    shard_prefix: str = None) -> List[str]:
+    """Redacts the `users` table on a pool of `workers` processes.
+
+    The table is split into `partitions` key ranges (8 per worker by
+    default). Each worker process uses its own get_pool(). Results
+    are written to `stream` in key order, or with `shard_prefix` each
+    range goes to its own `<shard_prefix>.<n>` file, whose paths are
+    returned.
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers * 8
+    stream = stream if stream is not None else sys.stderr
+    db = get_db()
+    try:
+        ranges = partition_users(db, partitions, key)
+    finally:
+        db.close()
+
+    tasks = [(key, low, high, batch_size,
+              f"{shard_prefix}.{i}" if shard_prefix else None)
+             for i, (low, high) in enumerate(ranges)]
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.imap(_export_partition, tasks)
+        if shard_prefix:
+            return list(results)
+        for text in results:
+            stream.write(text)
+        stream.flush()
+    return []
+
+
 def main():
     """Retrieves and logs user data with PII fields obfuscated."""
+    try:
+        batch_size = int(os.getenv("PERSONAL_DATA_BATCH_SIZE", 1000))
+    except ValueError:
+        batch_size = 1000
+    try:
+        workers = int(os.getenv("PERSONAL_DATA_WORKERS", 1))
+    except ValueError:
+        workers = 1
+    if workers > 1:
+        parallel_export(workers=workers, batch_size=batch_size)
+        return
+
     db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    logger = get_logger()
-
-    for row in cursor:
-        message = (
-            f"name={row[0]}; email={row[1]}; phone={row[2]}; "
-            f"ssn={row[3]}; password={row[4]}; ip={row[5]}; "
-            f"last_login={row[6]}; user_agent={row[7]};"
-        )
-        logger.info(message)
-
-    cursor.close()
+    logger = get_logger(asynchronous=True)
+
+    for messages in stream_users(db, batch_size):
+        for message in messages:
+            logger.info(message)
+
+    for handler in logger.handlers:
+        handler.flush()
     db.close()
 
 
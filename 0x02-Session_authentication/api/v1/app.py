@@ -30,6 +30,11 @@ else:
     from api.v1.auth.auth import Auth
     auth = Auth()
 
+EXCLUDED_PATHS = ['/api/v1/status/',
+                  '/api/v1/unauthorized/',
+                  '/api/v1/forbidden/',
+                  '/api/v1/auth_session/login/']
+
 
 @app.errorhandler(404)
 def not_found(error) -> str:
@@ -58,19 +63,28 @@ def before_request_handler():
     """
     if auth is None:
         return
-    if auth.require_auth(
-        request.path, ['/api/v1/status/',
-                       '/api/v1/unauthorized/',
-                       '/api/v1/forbidden/',
-                       '/api/v1/auth_session/login/']):
+    if auth.require_auth(request.path, EXCLUDED_PATHS):
         if (auth.authorization_header(request) is None and
                 auth.session_cookie(request) is None):
             abort(401)
-        request.current_user = auth.current_user(request)
-        if auth.current_user(request) is None:
+        request.current_user = auth.resolve_user(request)
+        if request.current_user is None:
             abort(403)
 
 
+@app.after_request
+def auth_timing_header(response):
+    """ Expose the authentication stage timings as a Server-Timing
+    header when AUTH_TIMING is set
+    """
+    timings = getattr(request, 'auth_timings', None)
+    if timings and getenv("AUTH_TIMING"):
+        response.headers['Server-Timing'] = ", ".join(
+            "auth-{};dur={:.3f}".format(stage, seconds * 1000)
+            for stage, seconds in timings.items())
+    return response
+
+
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
     port = getenv("API_PORT", "5000")
@@ -2,28 +2,68 @@
 """ Auth class
 """
 from flask import request
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import List, TypeVar
 import fnmatch
+import os
+import re
+import time
 from os import getenv
 
 
+class PathMatcher:
+    """ Excluded-path patterns compiled once
+    Plain paths go into a set, glob patterns into one regex, and
+    results for recently seen paths are memoized.
+    """
+    def __init__(self, patterns: List[str]):
+        """ Compile the fnmatch patterns
+        """
+        self.exact = set()
+        globs = []
+        for pattern in patterns:
+            pattern = os.path.normcase(pattern)
+            if any(char in pattern for char in '*?['):
+                globs.append(fnmatch.translate(pattern))
+            else:
+                self.exact.add(pattern)
+        self.regex = re.compile('|'.join(globs)) if globs else None
+        self.match = lru_cache(maxsize=1024)(self._match)
+
+    def _match(self, path: str) -> bool:
+        """ Check if a path matches one of the patterns
+        """
+        path = os.path.normcase(path)
+        if path in self.exact:
+            return True
+        return self.regex is not None and (
+            self.regex.match(path) is not None)
+
+
 class Auth:
     """ Manages the API authentication
     """
+    _matcher = None
+    _matcher_patterns = ()
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """ Check if authentication is required
+        The excluded paths are compiled into a PathMatcher, rebuilt only
+        when their content changes
         """
         if path is None:
             return True
         if excluded_paths is None or not excluded_paths:
             return True
 
-        path = path if path.endswith('/') else path + '/'
-        for pattern in excluded_paths:
-            if fnmatch.fnmatch(path, pattern):
-                return False
+        patterns = tuple(excluded_paths)
+        if patterns != self._matcher_patterns:
+            self._matcher = PathMatcher(patterns)
+            self._matcher_patterns = patterns
 
-        return True
+        path = path if path.endswith('/') else path + '/'
+        return not self._matcher.match(path)
 
     def authorization_header(self, request=None) -> str:
         """ Get the authorization header
@@ -38,6 +78,35 @@ class Auth:
         """
         return None
 
+    def resolve_user(self, request=None) -> TypeVar('User'):
+        """ current_user(), computed at most once per request
+        The result is cached on the request; the time spent in each
+        authentication stage is in request.auth_timings (seconds).
+        """
+        if request is None:
+            return self.current_user(request)
+        try:
+            return request._auth_principal
+        except AttributeError:
+            pass
+        request.auth_timings = {}
+        user = self.current_user(request)
+        request._auth_principal = user
+        return user
+
+    @contextmanager
+    def _timed(self, request, stage: str):
+        """ Add the time spent in the block to request.auth_timings
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings = getattr(request, 'auth_timings', None)
+            if timings is not None:
+                timings[stage] = (timings.get(stage, 0.0) +
+                                  time.perf_counter() - start)
+
     def session_cookie(self, request=None) -> str:
         """ Retrieve the session cookie value from the request
         """
@@ -4,6 +4,12 @@
 
 from api.v1.auth.auth import Auth
 import base64
+from collections import OrderedDict
+import hashlib
+import hmac
+from os import getenv, urandom
+import threading
+import time
 from typing import TypeVar
 from models.user import User
 
@@ -11,6 +17,24 @@ from models.user import User
 class BasicAuth(Auth):
     """ BasicAuth class that inherits from Auth
     """
+    def __init__(self):
+        """ Initialize the BasicAuth instance and its credential cache
+        Verified Authorization headers are cached by keyed digest only,
+        the plaintext header is never stored.
+        """
+        super().__init__()
+        try:
+            self.cache_size = int(getenv("BASIC_AUTH_CACHE_SIZE", 1024))
+        except (TypeError, ValueError):
+            self.cache_size = 1024
+        try:
+            self.cache_ttl = float(getenv("BASIC_AUTH_CACHE_TTL", 300))
+        except (TypeError, ValueError):
+            self.cache_ttl = 300
+        self._cache_key = urandom(32)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def extract_base64_authorization_header(
             self, authorization_header: str) -> str:
         """ Extracts the Base64 part of the Authorization header
@@ -49,24 +73,67 @@ class BasicAuth(Auth):
         return email, password
 
     def user_object_from_credentials(
-            self, user_email: str, user_pwd: str) -> TypeVar('User'):
+            self, user_email: str, user_pwd: str,
+            request=None) -> TypeVar('User'):
         """ Returns the User instance based on email and password
         """
         if user_email is None or not isinstance(user_email, str):
             return None
         if user_pwd is None or not isinstance(user_pwd, str):
             return None
-        try:
-            users = User.search({'email': user_email})
-        except Exception:
-            return None
+        with self._timed(request, 'lookup'):
+            try:
+                users = User.search({'email': user_email})
+            except Exception:
+                return None
         if not users:
             return None
-        for user in users:
-            if user.is_valid_password(user_pwd):
-                return user
+        with self._timed(request, 'verify'):
+            for user in users:
+                if user.is_valid_password(user_pwd):
+                    return user
         return None
 
+    def _header_digest(self, authorization_header: str) -> bytes:
+        """ Keyed digest of an Authorization header, used as cache key
+        """
+        return hmac.new(self._cache_key, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def cached_user(self, authorization_header: str) -> TypeVar('User'):
+        """ Returns the User cached for this header, or None
+        An entry is dropped when it expired, or when its user was removed
+        or changed email or password since it was verified.
+        """
+        if self.cache_size <= 0:
+            return None
+        digest = self._header_digest(authorization_header)
+        with self._cache_lock:
+            entry = self._cache.get(digest)
+            if entry is None:
+                return None
+            user_id, email, password, expires_at = entry
+            user = User.get(user_id)
+            if (user is None or expires_at < time.monotonic() or
+                    user.email != email or user.password != password):
+                del self._cache[digest]
+                return None
+            self._cache.move_to_end(digest)
+            return user
+
+    def cache_user(self, authorization_header: str, user: TypeVar('User')):
+        """ Remember that this header authenticates the given user
+        """
+        if self.cache_size <= 0:
+            return
+        digest = self._header_digest(authorization_header)
+        with self._cache_lock:
+            self._cache[digest] = (user.id, user.email, user.password,
+                                   time.monotonic() + self.cache_ttl)
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
     def current_user(self, request=None) -> TypeVar('User'):
         """ Retrieves the User instance for a request
         """
@@ -74,16 +141,23 @@ class BasicAuth(Auth):
         if not auth_header:
             return None
 
-        base64_header = self.extract_base64_authorization_header(auth_header)
-        if not base64_header:
-            return None
-
-        decoded_header = self.decode_base64_authorization_header(base64_header)
-        if not decoded_header:
-            return None
+        with self._timed(request, 'lookup'):
+            user = self.cached_user(auth_header)
+        if user is not None:
+            return user
 
-        user_email, user_pwd = self.extract_user_credentials(decoded_header)
+        with self._timed(request, 'header'):
+            base64_header = self.extract_base64_authorization_header(
+                auth_header)
+            decoded_header = self.decode_base64_authorization_header(
+                base64_header)
+            user_email, user_pwd = self.extract_user_credentials(
+                decoded_header)
         if not user_email or not user_pwd:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd,
+                                                 request)
+        if user is not None:
+            self.cache_user(auth_header, user)
+        return user
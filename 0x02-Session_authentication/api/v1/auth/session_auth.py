@@ -30,11 +30,14 @@ class SessionAuth(Auth):
     def current_user(self, request=None) -> User:
         """ Overrided to get the current user based on session cookie
         """
-        cookie_value = self.session_cookie(request)
-        user_id = self.user_id_for_session_id(cookie_value)
+        with self._timed(request, 'header'):
+            cookie_value = self.session_cookie(request)
+        with self._timed(request, 'lookup'):
+            user_id = self.user_id_for_session_id(cookie_value)
         if user_id is None:
             return None
-        return User.get(user_id)
+        with self._timed(request, 'verify'):
+            return User.get(user_id)
 
     def destroy_session(self, request=None) -> bool:
         """ Delete the user session / logout
@@ -44,5 +47,6 @@ class SessionAuth(Auth):
         session_id = self.session_cookie(request)
         if session_id is None or not self.user_id_for_session_id(session_id):
             return False
-        del self.user_id_by_session_id[session_id]
+        # the expiry sweeper may have evicted it in the meantime
+        self.user_id_by_session_id.pop(session_id, None)
         return True
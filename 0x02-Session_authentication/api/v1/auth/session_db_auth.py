@@ -2,12 +2,23 @@
 """ Session Database Authentication
 """
 from api.v1.auth.session_exp_auth import SessionExpAuth
+from datetime import timezone
+import heapq
 from models.user_session import UserSession
 
 
 class SessionDBAuth(SessionExpAuth):
     """ Session Database Authentication class
     """
+    def __init__(self):
+        """ Initialize the SessionDBAuth instance and its session store
+        """
+        super().__init__()
+        UserSession.load_from_file()
+        for user_session in UserSession.all():
+            self._schedule_expiry(user_session.session_id,
+                                  self._created_ts(user_session))
+
     def create_session(self, user_id=None):
         """ Create a session ID and store it in the UserSession
         """
@@ -24,11 +35,10 @@ class SessionDBAuth(SessionExpAuth):
         """
         if session_id is None:
             return None
-        user_sessions = UserSession.all()
-        for user_session in user_sessions:
-            if user_session.session_id == session_id:
-                return user_session.user_id
-        return None
+        user_sessions = UserSession.search({"session_id": session_id})
+        if not user_sessions:
+            return None
+        return user_sessions[0].user_id
 
     def destroy_session(self, request=None):
         """ Destroys the UserSession based on the Session ID from the cookie
@@ -41,3 +51,28 @@ class SessionDBAuth(SessionExpAuth):
             user_session[0].remove()
             return True
         return False
+
+    @staticmethod
+    def _created_ts(user_session: UserSession) -> float:
+        """ Creation time of a UserSession in epoch seconds
+        """
+        return user_session.created_at.replace(
+            tzinfo=timezone.utc).timestamp()
+
+    def _evict_session(self, session_id, now):
+        """ Delete an expired session from memory and its UserSession rows
+        Called without the expiry lock held; each remove() takes the store
+        lock on its own
+        """
+        self.user_id_by_session_id.pop(session_id, None)
+        evicted = False
+        for user_session in UserSession.search({"session_id": session_id}):
+            expires_at = self._created_ts(user_session) + self.session_duration
+            if expires_at > now:
+                with self._expiry_lock:
+                    heapq.heappush(self._expiry_heap,
+                                   (expires_at, session_id))
+                continue
+            user_session.remove()
+            evicted = True
+        return evicted
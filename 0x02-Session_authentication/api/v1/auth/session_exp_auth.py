@@ -4,6 +4,13 @@
 from datetime import datetime, timedelta
 from os import getenv
 from api.v1.auth.session_auth import SessionAuth
+import heapq
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
 
 
 class SessionExpAuth(SessionAuth):
@@ -17,6 +24,31 @@ class SessionExpAuth(SessionAuth):
             self.session_duration = int(getenv("SESSION_DURATION"))
         except (TypeError, ValueError):
             self.session_duration = 0
+        try:
+            self.sweep_interval = float(getenv("SESSION_SWEEP_INTERVAL", 60))
+        except (TypeError, ValueError):
+            self.sweep_interval = 60
+        try:
+            self.sweep_batch_size = int(getenv("SESSION_SWEEP_BATCH", 1000))
+        except (TypeError, ValueError):
+            self.sweep_batch_size = 1000
+
+        self.sweep_stats = {
+            'sweeps': 0,
+            'evicted': 0,
+            'last_evicted': 0,
+            'last_sweep_duration': 0.0,
+            'errors': 0,
+        }
+        self._expiry_heap = []
+        self._expiry_lock = threading.Lock()
+        self._sweeper_stop = threading.Event()
+        self._sweeper = None
+        if self.session_duration > 0 and self.sweep_interval > 0:
+            self._sweeper = threading.Thread(target=self._sweep_forever,
+                                             name="session-sweeper",
+                                             daemon=True)
+            self._sweeper.start()
 
     def create_session(self, user_id=None):
         """ Create a session ID with an expiration date
@@ -25,10 +57,12 @@ class SessionExpAuth(SessionAuth):
         if session_id is None:
             return None
 
+        created_at = datetime.now()
         self.user_id_by_session_id[session_id] = {
             'user_id': user_id,
-            'created_at': datetime.now()
+            'created_at': created_at
         }
+        self._schedule_expiry(session_id, created_at.timestamp())
         return session_id
 
     def user_id_for_session_id(self, session_id=None):
@@ -50,3 +84,88 @@ class SessionExpAuth(SessionAuth):
                 datetime.now()):
             return None
         return session_dict.get('user_id')
+
+    def _schedule_expiry(self, session_id: str, created_ts: float):
+        """ Register a session in the expiry heap (epoch seconds)
+        """
+        if self.session_duration <= 0:
+            return
+        with self._expiry_lock:
+            heapq.heappush(self._expiry_heap,
+                           (created_ts + self.session_duration, session_id))
+
+    def _is_expired(self, session_id: str, now: float) -> bool:
+        """ Check whether a stored session is past its expiry time
+        """
+        session_dict = self.user_id_by_session_id.get(session_id)
+        if not isinstance(session_dict, dict):
+            return False
+        created_at = session_dict.get('created_at')
+        if created_at is None:
+            return True
+        return created_at.timestamp() + self.session_duration <= now
+
+    def _evict_session(self, session_id: str, now: float) -> bool:
+        """ Delete one expired session, returns True if it was evicted
+        """
+        if not self._is_expired(session_id, now):
+            return False
+        # a concurrent logout may have removed it already
+        return self.user_id_by_session_id.pop(session_id, None) is not None
+
+    def sweep_expired_sessions(self, now: float = None) -> int:
+        """ Evict every expired session in batches of sweep_batch_size
+        Each due batch is popped under the expiry lock and evicted after
+        releasing it, so logins never wait on evictions.
+        Returns the number of evicted sessions.
+        """
+        if now is None:
+            now = time.time()
+        start = time.perf_counter()
+        evicted = 0
+        errors = 0
+        while True:
+            batch = []
+            with self._expiry_lock:
+                while (self._expiry_heap and
+                       self._expiry_heap[0][0] <= now and
+                       len(batch) < self.sweep_batch_size):
+                    batch.append(heapq.heappop(self._expiry_heap)[1])
+            if not batch:
+                break
+            for session_id in batch:
+                try:
+                    if self._evict_session(session_id, now):
+                        evicted += 1
+                except Exception:
+                    # keep sweeping; one bad session must not stall
+                    # the others
+                    errors += 1
+                    logger.exception("evicting session %s failed",
+                                     session_id)
+
+        self.sweep_stats['sweeps'] += 1
+        self.sweep_stats['evicted'] += evicted
+        self.sweep_stats['last_evicted'] = evicted
+        self.sweep_stats['errors'] += errors
+        self.sweep_stats['last_sweep_duration'] = (time.perf_counter() -
+                                                   start)
+        return evicted
+
+    def _sweep_forever(self):
+        """ Background sweeper loop
+        """
+        while not self._sweeper_stop.wait(self.sweep_interval):
+            try:
+                self.sweep_expired_sessions()
+            except Exception:
+                self.sweep_stats['errors'] += 1
+                logger.exception("session sweep failed")
+
+    def stop_sweeper(self):
+        """ Stop the background sweeper thread
+        """
+        self._sweeper_stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
@@ -2,18 +2,111 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
+import base64
+import binascii
+import json
+
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000
+
+
+def encode_cursor(user_id: str) -> str:
+    """ Opaque cursor pointing after the given User ID
+    """
+    return base64.urlsafe_b64encode(user_id.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    """ User ID of a cursor, ValueError if it is malformed
+    """
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4),
+                                altchars=b'-_', validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(cursor)
+
+
+def stream_users(after: str, limit: int, fields: list, ndjson: bool):
+    """ Serialize users ordered by ID, one store page at a time
+    """
+    if not ndjson:
+        yield '['
+    first = True
+    while limit is None or limit > 0:
+        size = STREAM_CHUNK_SIZE if limit is None else min(limit,
+                                                           STREAM_CHUNK_SIZE)
+        users = User.page(after, size)
+        if not users:
+            break
+        for user in users:
+            line = json.dumps(user.to_json(fields=fields))
+            if ndjson:
+                yield line + '\n'
+            else:
+                yield line if first else ',' + line
+            first = False
+        after = users[-1].id
+        if limit is not None:
+            limit -= len(users)
+    if not ndjson:
+        yield ']\n'
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (all optional):
+      - limit: page size (at most MAX_PAGE_SIZE)
+      - cursor: `next_cursor` of the previous page
+      - fields: comma-separated attributes to return
+      - stream: `json` (array) or `ndjson`, generated lazily
     Return:
       - list of all User objects JSON represented
+      - with limit or cursor: {"users": [...], "next_cursor": ...}
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field]
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'error': "Invalid cursor"}), 400
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "Invalid limit"}), 400
+
+    stream = request.args.get('stream')
+    if stream is not None:
+        if stream not in ('json', 'ndjson'):
+            return jsonify({'error': "Invalid stream"}), 400
+        mimetype = ('application/x-ndjson' if stream == 'ndjson'
+                    else 'application/json')
+        return Response(stream_users(after, limit, fields,
+                                     stream == 'ndjson'), mimetype=mimetype)
+
+    if limit is None and after is None:
+        all_users = [user.to_json(fields=fields) for user in User.all()]
+        return jsonify(all_users)
+
+    limit = min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+    users = User.page(after, limit + 1)
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1].id)
+    return jsonify({'users': [user.to_json(fields=fields) for user in users],
+                    'next_cursor': next_cursor})
 
 
 @app_views.route('/users/me', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+""" Load-testing harness for the API under each AUTH_TYPE
+
+Seeds N users (and M sessions) into a fresh JSON store, starts the API
+as a local server per AUTH_TYPE and drives it with concurrent clients.
+Reports p50/p95/p99 latency and throughput per AUTH_TYPE and endpoint,
+and writes them as JSON so runs can be compared between commits:
+
+    ./benchmark.py --users 10000 --sessions 10000 --concurrency 16 \
+        --output bench.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+import argparse
+import base64
+import hashlib
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+AUTH_TYPES = ["auth", "basic_auth", "session_auth", "session_exp_auth",
+              "session_db_auth"]
+SESSION_TYPES = ["session_auth", "session_exp_auth", "session_db_auth"]
+SESSION_NAME = "_my_session_id"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def seed_store(directory: str, users: int, sessions: int) -> list:
+    """ Write .db_User.json (and .db_UserSession.json) into directory
+    Returns the (email, password) credentials of the seeded users
+    """
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    credentials = []
+    store = {}
+    for i in range(users):
+        email = "user{}@bench.local".format(i)
+        password = "pwd{}".format(i)
+        user_id = str(uuid.uuid4())
+        store[user_id] = {
+            "id": user_id, "created_at": now, "updated_at": now,
+            "email": email, "first_name": None, "last_name": None,
+            "_password": hashlib.sha256(password.encode()).hexdigest(),
+        }
+        credentials.append((email, password))
+    with open(os.path.join(directory, ".db_User.json"), "w") as f:
+        json.dump(store, f)
+
+    user_ids = list(store.keys())
+    user_sessions = {}
+    for i in range(sessions if user_ids else 0):
+        session_id = str(uuid.uuid4())
+        user_sessions[session_id] = {
+            "id": session_id, "created_at": now, "updated_at": now,
+            "user_id": user_ids[i % len(user_ids)],
+            "session_id": str(uuid.uuid4()),
+        }
+    with open(os.path.join(directory, ".db_UserSession.json"), "w") as f:
+        json.dump(user_sessions, f)
+    return credentials
+
+
+def free_port() -> int:
+    """ Ask the OS for an unused TCP port
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(directory: str, auth_type: str, port: int):
+    """ Start `python -m api.v1.app` in directory and wait until it answers
+    """
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": HERE, "API_HOST": "127.0.0.1", "API_PORT": str(port),
+        "SESSION_NAME": SESSION_NAME,
+        "SESSION_DURATION": env.get("SESSION_DURATION", "3600"),
+    })
+    env.pop("AUTH_TYPE", None)
+    if auth_type != "auth":
+        env["AUTH_TYPE"] = auth_type
+    server = subprocess.Popen([sys.executable, "-m", "api.v1.app"],
+                              cwd=directory, env=env,
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            status, _, _ = request(port, "GET", "/api/v1/status")
+            if status == 200:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("API server for {} did not start".format(auth_type))
+
+
+def request(port: int, method: str, path: str, headers: dict = None,
+            body: str = None) -> tuple:
+    """ Send one request, returns (status, headers, elapsed seconds)
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    start = time.perf_counter()
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        response.read()
+        return (response.status, response.getheaders(),
+                time.perf_counter() - start)
+    finally:
+        connection.close()
+
+
+def login(port: int, email: str, password: str) -> tuple:
+    """ POST /auth_session/login, returns (status, cookie, elapsed)
+    """
+    status, headers, elapsed = request(
+        port, "POST", "/api/v1/auth_session/login",
+        {"Content-Type": "application/x-www-form-urlencoded"},
+        urlencode({"email": email, "password": password}))
+    cookie = None
+    for name, value in headers:
+        if name.lower() == "set-cookie":
+            cookie = value.split(";", 1)[0]
+    return status, cookie, elapsed
+
+
+def percentile(values: list, fraction: float) -> float:
+    """ Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values)))
+                                     - 1))
+    return values[index]
+
+
+def drive(calls: list, concurrency: int) -> dict:
+    """ Run the zero-argument calls on `concurrency` threads
+    Each call returns (status, elapsed); returns the latency summary
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda call: call(), calls))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed for _, elapsed in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(results),
+        "status": statuses,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": (sum(latencies) / len(latencies) * 1000
+                    if latencies else 0.0),
+        "throughput_rps": len(results) / wall if wall else 0.0,
+    }
+
+
+def bench_auth_type(auth_type: str, args) -> list:
+    """ Benchmark every endpoint under one AUTH_TYPE
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        credentials = seed_store(directory, args.users, args.sessions)
+        port = free_port()
+        server = start_server(directory, auth_type, port)
+        try:
+            headers = {}
+            if auth_type == "basic_auth" and credentials:
+                email, password = credentials[0]
+                token = base64.b64encode("{}:{}".format(
+                    email, password).encode()).decode()
+                headers["Authorization"] = "Basic " + token
+            elif auth_type in SESSION_TYPES and credentials:
+                if auth_type != "session_db_auth":
+                    # in-memory stores can only be filled through the API
+                    for i in range(args.sessions):
+                        login(port, *credentials[i % len(credentials)])
+                _, cookie, _ = login(port, *credentials[0])
+                headers["Cookie"] = cookie
+            else:
+                headers["Authorization"] = "Basic unused"
+
+            endpoints = [("GET /api/v1/users", "/api/v1/users"),
+                         ("GET /api/v1/users/me", "/api/v1/users/me")]
+            for name, path in endpoints:
+                calls = [lambda path=path: request(
+                    port, "GET", path, headers)[0::2]
+                    for _ in range(args.requests)]
+                drive(calls[:args.concurrency], args.concurrency)
+                summary = drive(calls, args.concurrency)
+                summary.update({"auth_type": auth_type, "endpoint": name})
+                results.append(summary)
+
+            if auth_type in SESSION_TYPES and credentials:
+                calls = [lambda i=i: login(
+                    port, *credentials[i % len(credentials)])[0::2]
+                    for i in range(args.requests)]
+                summary = drive(calls, args.concurrency)
+                summary.update({"auth_type": auth_type,
+                                "endpoint": "POST /api/v1/auth_session/login"})
+                results.append(summary)
+        finally:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def git_commit() -> str:
+    """ Current commit of the repository, if any
+    """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=HERE,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    """ Parse arguments, run the benchmarks and write the results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=500,
+                        help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--auth-types", nargs="+", default=AUTH_TYPES,
+                        choices=AUTH_TYPES)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for auth_type in args.auth_types:
+        results.extend(bench_auth_type(auth_type, args))
+
+    print("{:<17} {:<32} {:>8} {:>8} {:>8} {:>9}  {}".format(
+        "AUTH_TYPE", "endpoint", "p50 ms", "p95 ms", "p99 ms", "req/s",
+        "status"))
+    for row in results:
+        print("{:<17} {:<32} {:>8.2f} {:>8.2f} {:>8.2f} {:>9.1f}  {}".format(
+            row["auth_type"], row["endpoint"], row["p50_ms"],
+            row["p95_ms"], row["p99_ms"], row["throughput_rps"],
+            row["status"]))
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.utcnow().strftime(TIMESTAMP_FORMAT),
+                "python": platform.python_version(),
+                "users": args.users, "sessions": args.sessions,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
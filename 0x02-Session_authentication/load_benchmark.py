@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+""" Cold-start time of User.load_from_file against store size
+
+For each size, writes a .db_User.json snapshot into a scratch directory
+and times loading it eagerly, lazily (LAZY_LOAD) and, for reference,
+the previous way (json.load, then strptime for every timestamp):
+
+    ./load_benchmark.py --sizes 10000 100000 1000000 --output load.json
+"""
+from datetime import datetime
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from memory_benchmark import DictRecord
+from models.base import TIMESTAMP_FORMAT
+from models.user import User
+
+
+def write_snapshot(directory: str, size: int) -> None:
+    """ Write a .db_User.json snapshot of `size` users
+    """
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    store = {}
+    for i in range(size):
+        user_id = str(uuid.uuid4())
+        store[user_id] = {
+            "id": user_id, "created_at": now, "updated_at": now,
+            "email": "user{}@bench.local".format(i), "first_name": None,
+            "last_name": None, "_password": "{:064x}".format(i),
+        }
+    with open(os.path.join(directory, ".db_User.json"), "w") as f:
+        json.dump(store, f)
+
+
+def load_previous() -> dict:
+    """ The loader as it was: whole-file json.load and strptime
+    """
+    with open(".db_User.json") as f:
+        return {obj_id: DictRecord(**obj_json)
+                for obj_id, obj_json in json.load(f).items()}
+
+
+def timed(func) -> float:
+    """ Seconds taken by func()
+    """
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    """ Parse arguments, run the benchmarks and print the results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000])
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    cwd = os.getcwd()
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            write_snapshot(directory, size)
+            os.chdir(directory)
+            try:
+                results.append({
+                    "users": size,
+                    "previous_s": timed(load_previous),
+                    "eager_s": timed(lambda: User.load_from_file(False)),
+                    "lazy_s": timed(lambda: User.load_from_file(True)),
+                })
+            finally:
+                os.chdir(cwd)
+
+    print("{:>10} {:>12} {:>10} {:>10}".format(
+        "users", "previous s", "eager s", "lazy s"))
+    for row in results:
+        print("{:>10} {:>12.3f} {:>10.3f} {:>10.3f}".format(
+            row["users"], row["previous_s"], row["eager_s"], row["lazy_s"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
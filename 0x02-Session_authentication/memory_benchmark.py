@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+""" Memory footprint of the in-memory store, in bytes per object
+
+Builds N User and N UserSession objects (and their DATA entries) with
+the slotted models, then with a reference class laid out like the
+previous models (a per-instance __dict__, a 36-char id string and two
+datetime objects), and reports the traced allocations per object.
+Both builds decode the same JSON records, so only what stays in memory
+is counted:
+
+    ./memory_benchmark.py --objects 10000 --output memory.json
+"""
+from datetime import datetime
+import argparse
+import gc
+import json
+import tracemalloc
+import uuid
+
+from models.base import TIMESTAMP_FORMAT
+from models.user import User
+from models.user_session import UserSession
+
+
+class DictRecord():
+    """ Previous layout of a Base instance
+    """
+
+    def __init__(self, **kwargs):
+        """ Same attributes as the models, all in __dict__
+        """
+        self.id = kwargs.get('id')
+        self.created_at = datetime.strptime(kwargs.get('created_at'),
+                                            TIMESTAMP_FORMAT)
+        self.updated_at = datetime.strptime(kwargs.get('updated_at'),
+                                            TIMESTAMP_FORMAT)
+        for key, value in kwargs.items():
+            if key not in ('id', 'created_at', 'updated_at'):
+                setattr(self, key, value)
+
+
+def user_records(count: int) -> list:
+    """ JSON records of .db_User.json
+    """
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    return [json.dumps({"id": str(uuid.uuid4()), "created_at": now,
+                        "updated_at": now,
+                        "email": "user{}@bench.local".format(i),
+                        "first_name": None, "last_name": None,
+                        "_password": "{:064x}".format(i)})
+            for i in range(count)]
+
+
+def session_records(count: int) -> list:
+    """ JSON records of .db_UserSession.json
+    """
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    return [json.dumps({"id": str(uuid.uuid4()), "created_at": now,
+                        "updated_at": now, "user_id": str(uuid.uuid4()),
+                        "session_id": str(uuid.uuid4())})
+            for _ in range(count)]
+
+
+def measure(build, records: list) -> float:
+    """ Traced bytes per object kept alive by build(records)
+    """
+    # warm up first so one-off caches (strptime, uuid) are not counted
+    build(records[:10])
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(records)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    return (after - before) / len(records)
+
+
+def build_dict_records(records: list) -> dict:
+    """ DATA as it was: id string -> DictRecord
+    """
+    store = {}
+    for line in records:
+        record = json.loads(line)
+        store[record["id"]] = DictRecord(**record)
+    return store
+
+
+def build_models(cls):
+    """ DATA as it is now: packed key -> slotted model
+    """
+    def build(records: list) -> dict:
+        store = {}
+        for line in records:
+            obj = cls(**json.loads(line))
+            store[obj._key] = obj
+        return store
+    return build
+
+
+def main() -> None:
+    """ Parse arguments, measure and print the results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--objects", type=int, default=10000)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for name, cls, make in (("User", User, user_records),
+                            ("UserSession", UserSession, session_records)):
+        records = make(args.objects)
+        results.append({
+            "model": name, "objects": args.objects,
+            "before_bytes": measure(build_dict_records, records),
+            "after_bytes": measure(build_models(cls), records),
+        })
+
+    print("{:<12} {:>10} {:>14} {:>13}".format(
+        "model", "objects", "before B/obj", "after B/obj"))
+    for row in results:
+        print("{:<12} {:>10} {:>14.1f} {:>13.1f}".format(
+            row["model"], row["objects"], row["before_bytes"],
+            row["after_bytes"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
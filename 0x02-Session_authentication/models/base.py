@@ -1,20 +1,145 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import TypeVar, List, Iterable
 from os import path
+import bisect
 import json
+import os
+import re
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+# raw JSON records of lazily loaded objects, by class then DATA key
+PENDING = {}
+INDEXES = {}
+JOURNAL = {}
+JOURNAL_COMPACT_SIZE = 1000
+# guards DATA, PENDING, INDEXES and the journal against concurrent
+# threads (requests and the session sweeper); journal records are written
+# under it, so they follow the order of the changes in memory
+STORE_LOCK = threading.RLock()
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+# prefix of ids that are not canonical UUIDs, see pack_id
+FOREIGN_ID_PREFIX = b'\xff' * 17
+UNINDEXED = object()
+SNAPSHOT_START = re.compile(r'[ \t\n\r]*\{')
+SNAPSHOT_END = re.compile(r'[ \t\n\r]*\}')
+FIRST_ITEM = re.compile(r'[ \t\n\r]*"')
+NEXT_ITEM = re.compile(r'[ \t\n\r]*,[ \t\n\r]*"')
+ITEM_COLON = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+SNAPSHOT_CHUNK_SIZE = 1 << 20
+
+
+def pack_id(obj_id: str):
+    """ Compact DATA key of an id
+    A canonical UUID string is packed into its 16 bytes; any other string
+    gets FOREIGN_ID_PREFIX so it is never 16 bytes long and sorts after
+    every UUID. Packed UUIDs sort like their strings.
+    """
+    if type(obj_id) is not str:
+        return obj_id
+    if len(obj_id) == 36 and \
+            obj_id[8] == obj_id[13] == obj_id[18] == obj_id[23] == '-':
+        digits = obj_id.replace('-', '')
+        try:
+            key = bytes.fromhex(digits)
+        except ValueError:
+            key = None
+        if key is not None and len(key) == 16 and key.hex() == digits:
+            return key
+    return FOREIGN_ID_PREFIX + obj_id.encode()
+
+
+def unpack_id(key) -> str:
+    """ Id of a DATA key made by pack_id
+    """
+    if type(key) is not bytes:
+        return key
+    if len(key) == 16:
+        digits = key.hex()
+        return '-'.join((digits[:8], digits[8:12], digits[12:16],
+                         digits[16:20], digits[20:]))
+    return key[len(FOREIGN_ID_PREFIX):].decode()
+
+
+def pack_timestamp(value: datetime) -> int:
+    """ Whole seconds since the epoch of a naive UTC datetime
+    """
+    return (value - EPOCH) // ONE_SECOND
+
+
+def unpack_timestamp(value: int) -> datetime:
+    """ Naive UTC datetime of a packed timestamp
+    """
+    return EPOCH + timedelta(seconds=value)
+
+
+def parse_timestamp(value: str) -> int:
+    """ Packed timestamp of a TIMESTAMP_FORMAT string
+    The format is fixed ISO 8601, so fromisoformat parses it much faster
+    than strptime.
+    """
+    if len(value) != 19 or value[10] != 'T':
+        raise ValueError("time data {!r} does not match format {!r}".format(
+            value, TIMESTAMP_FORMAT))
+    return pack_timestamp(datetime.fromisoformat(value))
+
+
+def iter_snapshot(f, chunk_size: int = SNAPSHOT_CHUNK_SIZE):
+    """ Yield the (id, record) items of a snapshot file one at a time
+    The file is read in chunks, so the document is never held in memory
+    as one string or one dict.
+    """
+    scan_once = json.JSONDecoder().scan_once
+    buf = f.read(chunk_size)
+    match = SNAPSHOT_START.match(buf)
+    if match is None:
+        raise ValueError("snapshot is not a JSON object")
+    pos = match.end()
+    offset = 0
+    item = FIRST_ITEM
+    eof = False
+    while True:
+        try:
+            match = item.match(buf, pos)
+            if match is None:
+                if SNAPSHOT_END.match(buf, pos):
+                    return
+                raise ValueError("expected an item at {}".format(pos))
+            obj_id, end = json.decoder.scanstring(buf, match.end())
+            match = ITEM_COLON.match(buf, end)
+            if match is None:
+                raise ValueError("expected ':' at {}".format(end))
+            obj_json, end = scan_once(buf, match.end())
+        except (StopIteration, ValueError):
+            # the item may continue in the next chunk
+            if eof:
+                raise ValueError("malformed snapshot at {}".format(
+                    offset + pos))
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            offset += pos
+            pos = 0
+            continue
+        yield obj_id, obj_json
+        pos = end
+        item = NEXT_ITEM
 
 
 class Base():
     """ Base class
+    Instances are slotted: the id is kept as a packed key (see pack_id)
+    and timestamps as integer seconds, both exposed through properties.
     """
+    __slots__ = ('_key', '_created_at', '_updated_at')
+    INDEXED_ATTRIBUTES = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -23,18 +148,83 @@ class Base():
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        if 'id' in kwargs:
+            self.id = kwargs['id']
+        else:
+            self.id = str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self._created_at = parse_timestamp(kwargs['created_at'])
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self._updated_at = parse_timestamp(kwargs['updated_at'])
         else:
             self.updated_at = datetime.utcnow()
 
+    @property
+    def id(self) -> str:
+        """ Getter of the id
+        """
+        return unpack_id(self._key)
+
+    @id.setter
+    def id(self, value: str):
+        """ Setter of the id
+        """
+        self._key = pack_id(value)
+
+    @property
+    def created_at(self) -> datetime:
+        """ Getter of the creation time
+        """
+        return unpack_timestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation time, kept to the second
+        """
+        self._created_at = pack_timestamp(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Getter of the last update time
+        """
+        return unpack_timestamp(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update time, kept to the second
+        """
+        self._updated_at = pack_timestamp(value)
+
+    @classmethod
+    def _fields(cls) -> tuple:
+        """ Names of the serialized attributes, in declaration order
+        """
+        fields = cls.__dict__.get('_FIELDS')
+        if fields is None:
+            fields = ['id', 'created_at', 'updated_at']
+            for klass in reversed(cls.__mro__[:cls.__mro__.index(Base)]):
+                fields.extend(name for name in klass.__dict__.get(
+                    '__slots__', ()) if name != '__dict__')
+            fields = tuple(fields)
+            cls._FIELDS = fields
+        return fields
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, re-indexing a stored object right away
+        when the attribute is indexed, so search() sees unsaved changes
+        exactly like a full scan of DATA would
+        """
+        object.__setattr__(self, name, value)
+        if name in self.INDEXED_ATTRIBUTES:
+            cls = self.__class__
+            key = getattr(self, '_key', None)
+            with STORE_LOCK:
+                if INDEXES.get(cls.__name__) is not None and \
+                        DATA.get(cls.__name__, {}).get(key) is self:
+                    cls._index_values(key, self)
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -42,15 +232,30 @@ class Base():
             return False
         if not isinstance(self, Base):
             return False
-        return (self.id == other.id)
+        return (self._key == other._key)
 
-    def to_json(self, for_serialization: bool = False) -> dict:
+    def to_json(self, for_serialization: bool = False,
+                fields: Iterable[str] = None) -> dict:
         """ Convert the object a JSON dictionary
+        With `fields`, only those attributes are serialized
         """
         result = {}
-        for key, value in self.__dict__.items():
+        extra = getattr(self, '__dict__', {})
+        known = self._fields()
+        if fields is None:
+            fields = known + tuple(extra)
+        for key in fields:
             if not for_serialization and key[0] == '_':
                 continue
+            if key in extra:
+                value = extra[key]
+            elif key in known:
+                try:
+                    value = getattr(self, key)
+                except AttributeError:
+                    continue
+            else:
+                continue
             if type(value) is datetime:
                 result[key] = value.strftime(TIMESTAMP_FORMAT)
             else:
@@ -58,55 +263,156 @@ class Base():
         return result
 
     @classmethod
-    def load_from_file(cls):
-        """ Load all objects from file
+    def load_from_file(cls, lazy: bool = None):
+        """ Load all objects from the snapshot file, then replay the journal
+        With `lazy` (default: the LAZY_LOAD environment variable), records
+        are kept as parsed JSON and an object is only built on first access
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        if lazy is None:
+            lazy = os.getenv("LAZY_LOAD", "") not in ("", "0")
+        with STORE_LOCK:
+            DATA[s_class] = {}
+            PENDING[s_class] = {}
+            JOURNAL[s_class] = 0
+
+            if path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    for obj_id, obj_json in iter_snapshot(f):
+                        if lazy:
+                            PENDING[s_class][pack_id(obj_id)] = obj_json
+                        else:
+                            obj = cls(**obj_json)
+                            DATA[s_class][obj._key] = obj
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+            torn = False
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                with open(journal_path, 'r') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # a torn last line left by a crash mid-append
+                            torn = True
+                            break
+                        key = pack_id(record.get('id'))
+                        if record.get('op') == 'save':
+                            if lazy:
+                                DATA[s_class].pop(key, None)
+                                PENDING[s_class][key] = record.get('obj')
+                            else:
+                                obj = cls(**record.get('obj'))
+                                DATA[s_class][obj._key] = obj
+                        elif record.get('op') == 'remove':
+                            DATA[s_class].pop(key, None)
+                            PENDING[s_class].pop(key, None)
+                        JOURNAL[s_class] += 1
+            cls._build_indexes()
+            if torn:
+                cls.save_to_file()
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to a snapshot file and reset the journal
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        with STORE_LOCK:
+            objs_json = {}
+            for obj in DATA[s_class].values():
+                objs_json[obj.id] = obj.to_json(True)
+            for key, obj_json in PENDING.get(s_class, {}).items():
+                objs_json[unpack_id(key)] = obj_json
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+            tmp_path = "{}.tmp".format(file_path)
+            with open(tmp_path, 'w') as f:
+                json.dump(objs_json, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                os.remove(journal_path)
+            JOURNAL[s_class] = 0
+
+    @classmethod
+    def append_to_journal(cls, record: dict):
+        """ Append one mutation record to the journal file
+        Compacts the journal into the snapshot once it holds
+        JOURNAL_COMPACT_SIZE records.
+        """
+        with STORE_LOCK:
+            f = cls._write_journal(record)
+        cls._sync_journal(f)
+
+    @classmethod
+    def _write_journal(cls, record: dict):
+        """ Write one record to the journal, with STORE_LOCK held
+        Returns the open journal file, to pass to _sync_journal once the
+        lock is released, or None if the journal was compacted instead
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        f = open(journal_path, 'a')
+        try:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+        except Exception:
+            f.close()
+            raise
+        JOURNAL[s_class] = JOURNAL.get(s_class, 0) + 1
+        if JOURNAL[s_class] >= JOURNAL_COMPACT_SIZE:
+            f.close()
+            cls.save_to_file()
+            return None
+        return f
+
+    @staticmethod
+    def _sync_journal(f):
+        """ Flush a journal file returned by _write_journal to disk
+        """
+        if f is None:
+            return
+        try:
+            os.fsync(f.fileno())
+        finally:
+            f.close()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with STORE_LOCK:
+            DATA[s_class][self._key] = self
+            PENDING.get(s_class, {}).pop(self._key, None)
+            self.__class__._index(self)
+            f = self.__class__._write_journal({'op': 'save', 'id': self.id,
+                                               'obj': self.to_json(True)})
+        self.__class__._sync_journal(f)
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        with STORE_LOCK:
+            if DATA[s_class].get(self._key) is None:
+                return
+            del DATA[s_class][self._key]
+            self.__class__._unindex(self._key)
+            f = self.__class__._write_journal({'op': 'remove',
+                                               'id': self.id})
+        self.__class__._sync_journal(f)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return len(DATA[s_class]) + len(PENDING.get(s_class, {}))
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,12 +424,144 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        return cls._object(pack_id(id))
+
+    @classmethod
+    def _object(cls, key) -> TypeVar('Base'):
+        """ Return one object by DATA key, building it from its pending
+        record on first access
+        """
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        obj = DATA[s_class].get(key)
+        if obj is not None:
+            return obj
+        with STORE_LOCK:
+            obj_json = PENDING.get(s_class, {}).get(key)
+            if obj_json is None:
+                # another thread may just have built it
+                return DATA[s_class].get(key)
+            obj = DATA[s_class].setdefault(key, cls(**obj_json))
+            PENDING[s_class].pop(key, None)
+            return obj
+
+    @classmethod
+    def _materialize(cls):
+        """ Build every pending object of the class
+        """
+        s_class = cls.__name__
+        with STORE_LOCK:
+            for key in list(PENDING.get(s_class, {})):
+                cls._object(key)
+
+    @classmethod
+    def _build_indexes(cls):
+        """ Rebuild all secondary indexes of the class from DATA
+        Besides the attribute indexes, keeps all ids in sorted order
+        """
+        s_class = cls.__name__
+        objs = DATA.get(s_class, {})
+        pending = PENDING.get(s_class, {})
+        INDEXES[s_class] = {'values': {}, 'by_id': {},
+                            'ids': sorted(list(objs) + list(pending))}
+        for attr in cls.INDEXED_ATTRIBUTES:
+            INDEXES[s_class]['values'][attr] = {}
+        for key, obj in objs.items():
+            cls._index_values(key, obj)
+        for key, obj_json in pending.items():
+            cls._index_values(key, obj_json)
+
+    @classmethod
+    def _index(cls, obj: TypeVar('Base')):
+        """ Add (or refresh) an object in the secondary indexes
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            cls._build_indexes()
+        if obj._key not in INDEXES[s_class]['by_id']:
+            bisect.insort(INDEXES[s_class]['ids'], obj._key)
+        cls._index_values(obj._key, obj)
+
+    @classmethod
+    def _index_values(cls, key, obj):
+        """ Index the current values of the indexed attributes of an
+        object, or of its pending JSON record
+        """
+        s_class = cls.__name__
+        cls._drop_values(key)
+        indexed = []
+        for attr in cls.INDEXED_ATTRIBUTES:
+            if type(obj) is dict:
+                value = obj.get(attr)
+            else:
+                value = getattr(obj, attr, None)
+            try:
+                bucket = INDEXES[s_class]['values'][attr].setdefault(value,
+                                                                     {})
+            except TypeError:
+                indexed.append(UNINDEXED)
+                continue
+            bucket[key] = None
+            indexed.append(value)
+        INDEXES[s_class]['by_id'][key] = tuple(indexed)
+
+    @classmethod
+    def _unindex(cls, key: bytes):
+        """ Drop an object, by DATA key, from the secondary indexes
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            return
+        if key in INDEXES[s_class]['by_id']:
+            ids = INDEXES[s_class]['ids']
+            position = bisect.bisect_left(ids, key)
+            if position < len(ids) and ids[position] == key:
+                del ids[position]
+        cls._drop_values(key)
+
+    @classmethod
+    def _drop_values(cls, key: bytes):
+        """ Drop an object's entries from the attribute indexes
+        """
+        s_class = cls.__name__
+        indexed = INDEXES[s_class]['by_id'].pop(key, None)
+        if indexed is None:
+            return
+        for attr, value in zip(cls.INDEXED_ATTRIBUTES, indexed):
+            if value is UNINDEXED:
+                continue
+            values = INDEXES[s_class]['values'][attr]
+            bucket = values.get(value)
+            if bucket is None:
+                continue
+            bucket.pop(key, None)
+            if not bucket:
+                del values[value]
+
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by id, starting after
+        the id `after`
+        """
+        s_class = cls.__name__
+        with STORE_LOCK:
+            if INDEXES.get(s_class) is None:
+                cls._build_indexes()
+            ids = INDEXES[s_class]['ids']
+            start = 0
+            if after is not None:
+                start = bisect.bisect_right(ids, pack_id(after))
+            end = len(ids) if limit is None else start + limit
+            objs = [cls._object(key) for key in ids[start:end]]
+        return [obj for obj in objs if obj is not None]
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        Equality lookups on an attribute listed in INDEXED_ATTRIBUTES are
+        resolved through the secondary index, which follows attribute
+        changes of stored objects even before they are saved; any other
+        attribute falls back to a full scan.
         """
         s_class = cls.__name__
 
@@ -135,4 +573,23 @@ class Base():
                     return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        candidates = None
+        with STORE_LOCK:
+            if INDEXES.get(s_class) is None:
+                cls._build_indexes()
+            for k, v in attributes.items():
+                values = INDEXES[s_class]['values'].get(k)
+                if values is None:
+                    continue
+                try:
+                    keys = list(values.get(v, ()))
+                except TypeError:
+                    continue
+                candidates = [obj for obj in map(cls._object, keys)
+                              if obj is not None]
+                break
+            if candidates is None:
+                cls._materialize()
+                candidates = list(DATA[s_class].values())
+
+        return list(filter(_search, candidates))
@@ -4,11 +4,26 @@ Basic Flask app
 """
 from flask import Flask, jsonify, request, abort, redirect
 from auth import Auth
+from hasher import HashingUnavailable
 
 app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.teardown_request
+def close_db_session(exception=None) -> None:
+    """Release the request's database session
+    """
+    AUTH.close_session()
+
+
+@app.errorhandler(HashingUnavailable)
+def hashing_unavailable(error) -> str:
+    """Password hashing is saturated, ask the client to retry
+    """
+    return jsonify({"message": "service unavailable"}), 503
+
+
 @app.route("/", methods=["GET"], strict_slashes=False)
 def index():
     """Root route that returns a JSON payload
@@ -56,7 +71,7 @@ def logout():
     if user is None:
         abort(403)
 
-    AUTH.destroy_session(user.id)
+    AUTH.destroy_session(user.id, session_id)
     return redirect('/')
 
 
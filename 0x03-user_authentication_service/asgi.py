@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+ASGI variant of the user authentication service
+
+Serves the same routes and responses as app.py from one event loop:
+database access goes through SQLAlchemy's asyncio extension (aiosqlite
+by default) and bcrypt runs on the shared hashing pool. Error and
+redirect pages are Werkzeug's, as Flask sends them.
+Run with any ASGI server, e.g. `uvicorn asgi:app`.
+
+Unlike app.py it does not cache sessions (every session lookup reads
+the database), does not rehash stale-cost passwords on login, and does
+not answer HEAD or OPTIONS requests.
+"""
+from http.cookies import SimpleCookie
+from os import getenv
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from urllib.parse import parse_qs
+from werkzeug.exceptions import default_exceptions
+from werkzeug.utils import redirect
+from db import USER_COLUMNS, _set_sqlite_pragmas, create_schema
+from hasher import HASHER, HashingUnavailable
+from user import User
+import asyncio
+import json
+import uuid
+
+
+class AsyncDB:
+    """Asyncio counterpart of db.DB
+    """
+
+    def __init__(self, url: str = None) -> None:
+        """Create the async engine; call init_schema() before use
+        The URL comes from ASYNC_DB_URL, or DB_URL with the aiosqlite
+        driver
+        """
+        if url is None:
+            url = getenv("ASYNC_DB_URL") or getenv(
+                "DB_URL", "sqlite:///a.db").replace(
+                    "sqlite://", "sqlite+aiosqlite://", 1)
+        self._engine = create_async_engine(url, echo=False)
+        if url.startswith("sqlite"):
+            event.listen(self._engine.sync_engine, "connect",
+                         _set_sqlite_pragmas)
+        self._sessions = sessionmaker(self._engine, class_=AsyncSession,
+                                      expire_on_commit=False)
+
+    async def init_schema(self) -> None:
+        """Create the schema, see db.create_schema
+        """
+        async with self._engine.begin() as connection:
+            await connection.run_sync(create_schema)
+
+    async def add_user(self, email: str, hashed_password: bytes) -> User:
+        """Add a new user to the database
+        """
+        new_user = User(email=email, hashed_password=hashed_password)
+        async with self._sessions() as session:
+            session.add(new_user)
+            await session.commit()
+        return new_user
+
+    async def find_user_by(self, **kwargs) -> User:
+        """Find a user by keyword arguments, or None
+        """
+        async with self._sessions() as session:
+            result = await session.execute(
+                select(User).filter_by(**kwargs).limit(1))
+            return result.scalars().first()
+
+    async def update_user_by(self, criteria: dict, **kwargs) -> bool:
+        """Update the user matching `criteria` in a single UPDATE statement
+        Returns whether a user matched; a None criterion never matches
+        """
+        for key in kwargs:
+            if key not in USER_COLUMNS:
+                raise ValueError
+        if not kwargs:
+            return False
+        if not criteria or any(value is None for value in criteria.values()):
+            return False
+        async with self._sessions() as session:
+            result = await session.execute(
+                update(User).filter_by(**criteria).values(**kwargs))
+            await session.commit()
+        return result.rowcount > 0
+
+
+class AsyncAuth:
+    """Asyncio counterpart of auth.Auth
+    """
+
+    def __init__(self) -> None:
+        """Initialize the async database
+        """
+        self._db = AsyncDB()
+        self._ready = None
+
+    async def init(self) -> None:
+        """Create the schema once, on the first call
+        """
+        if self._ready is None:
+            self._ready = asyncio.ensure_future(self._db.init_schema())
+        await asyncio.shield(self._ready)
+
+    async def register_user(self, email: str, password: str) -> User:
+        """Registers a new user, ValueError if the email is taken
+        """
+        if await self._db.find_user_by(email=email) is not None:
+            raise ValueError(f"User {email} already exists")
+        hashed_password = await HASHER.hashpw_async(password.encode(),
+                                                    HASHER.gensalt())
+        try:
+            return await self._db.add_user(email, hashed_password)
+        except IntegrityError:
+            raise ValueError(f"User {email} already exists")
+
+    async def valid_login(self, email: str, password: str) -> bool:
+        """Checks if the provided email and password
+        """
+        user = await self._db.find_user_by(email=email)
+        if user is None:
+            return False
+        return await HASHER.checkpw_async(password.encode(),
+                                          user.hashed_password)
+
+    async def create_session(self, email: str = None) -> str:
+        """Creates a new session for a user and returns the session ID
+        """
+        if email is None:
+            return None
+        session_id = str(uuid.uuid4())
+        if not await self._db.update_user_by({"email": email},
+                                             session_id=session_id):
+            return None
+        return session_id
+
+    async def get_user_from_session_id(self, session_id: str = None) -> User:
+        """Find a user by their session ID
+        """
+        if session_id is None:
+            return None
+        return await self._db.find_user_by(session_id=session_id)
+
+    async def destroy_session(self, user_id: int = None) -> None:
+        """Destroy a user's session by updating their session ID to None
+        """
+        if user_id is None:
+            return None
+        await self._db.update_user_by({"id": user_id}, session_id=None)
+
+    async def get_reset_password_token(self, email: str) -> str:
+        """Generate a reset password token for a user
+        """
+        reset_token = str(uuid.uuid4())
+        if not await self._db.update_user_by({"email": email},
+                                             reset_token=reset_token):
+            raise ValueError
+        return reset_token
+
+    async def update_password(self, reset_token: str, password: str) -> None:
+        """Update a user's password with the provided reset token
+        """
+        if reset_token is None:
+            raise ValueError
+        user = await self._db.find_user_by(reset_token=reset_token)
+        if user is None:
+            raise ValueError
+        hashed_password = await HASHER.hashpw_async(password.encode(),
+                                                    HASHER.gensalt())
+        if not await self._db.update_user_by({"id": user.id,
+                                              "reset_token": reset_token},
+                                             hashed_password=hashed_password,
+                                             reset_token=None):
+            raise ValueError
+
+
+AUTH = AsyncAuth()
+
+
+class Request:
+    """Parsed ASGI request: form fields and cookies
+    """
+
+    def __init__(self, scope: dict, body: bytes) -> None:
+        """Parse the urlencoded body and the Cookie header
+        """
+        self.form = {key: values[0] for key, values in
+                     parse_qs(body.decode("latin-1")).items()}
+        cookie = SimpleCookie()
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookie.load(value.decode("latin-1"))
+        self.cookies = {key: morsel.value for key, morsel in cookie.items()}
+
+
+def _json(payload: dict, status: int = 200, headers: list = None) -> tuple:
+    """JSON response tuple (status, headers, body)
+    """
+    body = (json.dumps(payload) + "\n").encode()
+    return status, [(b"content-type", b"application/json")] + (
+        headers or []), body
+
+
+def _headers(headers) -> list:
+    """ASGI headers of (name, value) string pairs
+    """
+    return [(name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers]
+
+
+def _abort(status: int, headers: list = None) -> tuple:
+    """Werkzeug's HTML error page for the given status
+    """
+    error = default_exceptions[status]()
+    return status, _headers(error.get_headers()) + (headers or []), \
+        error.get_body().encode()
+
+
+def _redirect(location: str) -> tuple:
+    """Werkzeug's 302 redirect page
+    """
+    response = redirect(location)
+    return response.status_code, _headers(
+        (name, value) for name, value in response.headers
+        if name != "Content-Length"), response.get_data()
+
+
+async def index(request: Request) -> tuple:
+    """GET /
+    """
+    return _json({"message": "Bienvenue"})
+
+
+async def users(request: Request) -> tuple:
+    """POST /users
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+    try:
+        user = await AUTH.register_user(email, password)
+        return _json({"email": user.email, "message": "user created"})
+    except ValueError:
+        return _json({"message": "email already registered"}, 400)
+
+
+async def login(request: Request) -> tuple:
+    """POST /sessions
+    """
+    email = request.form.get("email")
+    password = request.form.get("password")
+    if not await AUTH.valid_login(email, password):
+        return _abort(401)
+    session_id = await AUTH.create_session(email)
+    cookie = f"session_id={session_id}; Path=/".encode()
+    return _json({"email": email, "message": "logged in"},
+                 headers=[(b"set-cookie", cookie)])
+
+
+async def logout(request: Request) -> tuple:
+    """DELETE /sessions
+    """
+    user = await AUTH.get_user_from_session_id(
+        request.cookies.get("session_id"))
+    if user is None:
+        return _abort(403)
+    await AUTH.destroy_session(user.id)
+    return _redirect("/")
+
+
+async def profile(request: Request) -> tuple:
+    """GET /profile
+    """
+    user = await AUTH.get_user_from_session_id(
+        request.cookies.get("session_id"))
+    if user is None:
+        return _abort(403)
+    return _json({"email": user.email})
+
+
+async def get_reset_password_token(request: Request) -> tuple:
+    """POST /reset_password
+    """
+    email = request.form.get("email")
+    if not email:
+        return _abort(403)
+    try:
+        reset_token = await AUTH.get_reset_password_token(email)
+    except ValueError:
+        return _abort(403)
+    return _json({"email": email, "reset_token": reset_token})
+
+
+async def update_password(request: Request) -> tuple:
+    """PUT /reset_password
+    """
+    email = request.form.get("email")
+    reset_token = request.form.get("reset_token")
+    new_password = request.form.get("new_password")
+    if not email or not reset_token or not new_password:
+        return _abort(403)
+    try:
+        await AUTH.update_password(reset_token, new_password)
+    except ValueError:
+        return _abort(403)
+    return _json({"email": email, "message": "Password updated"})
+
+
+# path -> (strict_slashes, {method: handler}), mirroring app.py
+ROUTES = {
+    "/": (False, {"GET": index}),
+    "/users": (True, {"POST": users}),
+    "/sessions": (False, {"POST": login, "DELETE": logout}),
+    "/profile": (False, {"GET": profile}),
+    "/reset_password": (False, {"POST": get_reset_password_token,
+                                "PUT": update_password}),
+}
+
+
+def _route(path: str, method: str):
+    """Returns the handler for a request, or an error response
+    """
+    route = ROUTES.get(path)
+    if route is None and path.endswith("/") and len(path) > 1:
+        route = ROUTES.get(path[:-1])
+        if route is not None and route[0]:
+            route = None
+    if route is None:
+        return _abort(404)
+    handler = route[1].get(method)
+    if handler is None:
+        allow = ", ".join(route[1]).encode()
+        return _abort(405, [(b"allow", allow)])
+    return handler
+
+
+async def app(scope: dict, receive, send) -> None:
+    """ASGI application
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await AUTH.init()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    await AUTH.init()
+    handler = _route(scope["path"], scope["method"])
+    if isinstance(handler, tuple):
+        status, headers, content = handler
+    else:
+        try:
+            status, headers, content = await handler(Request(scope, body))
+        except HashingUnavailable:
+            status, headers, content = _json(
+                {"message": "service unavailable"}, 503)
+
+    await send({"type": "http.response.start", "status": status,
+                "headers": headers})
+    await send({"type": "http.response.body", "body": content})
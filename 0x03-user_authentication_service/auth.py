@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 """Auth module
 """
-import bcrypt
+from cache import LRUCache
 from db import DB
+from hasher import HASHER
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
+from typing import Callable, Iterable, Tuple
 from user import User
+import os
 import uuid
 
 
@@ -12,7 +16,7 @@ def _hash_password(password: str) -> bytes:
     """
     Returns a salted hash of the input password
     """
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return HASHER.hashpw(password.encode(), HASHER.gensalt())
 
 
 def _generate_uuid() -> str:
@@ -25,8 +29,29 @@ class Auth:
     """Auth class to interact with the authentication database
     """
 
-    def __init__(self):
+    def __init__(self, cache=None):
+        """Initialize the database and the session_id -> user cache
+        `cache` is any get/set/delete backend (see the cache module);
+        by default a bounded LRUCache sized by SESSION_CACHE_SIZE and
+        SESSION_CACHE_TTL
+
+        The cache holds session:<session_id> -> user entries (or False
+        once logged out) and email:<email> -> the session_id of the last
+        login. A session entry is only trusted while the email: key still
+        names it, so a new login revokes the previous session without
+        having to know it, and evicting either key just causes a miss.
+        """
         self._db = DB()
+        if cache is None:
+            cache = LRUCache(int(os.getenv("SESSION_CACHE_SIZE", 10000)),
+                             float(os.getenv("SESSION_CACHE_TTL", 300)))
+        self._cache = cache
+        self.cache_stats = {"hits": 0, "misses": 0}
+
+    def close_session(self) -> None:
+        """Release the database session of the current thread
+        """
+        self._db.close_session()
 
     def register_user(self, email: str, password: str) -> User:
         """Registers a new user with the given email and password
@@ -36,77 +61,207 @@ class Auth:
             raise ValueError(f"User {email} already exists")
         except NoResultFound:
             hashed_password = _hash_password(password)
-            user = self._db.add_user(email, hashed_password)
+            try:
+                user = self._db.add_user(email, hashed_password)
+            except IntegrityError:
+                raise ValueError(f"User {email} already exists")
             return user
 
+    def register_users(self, users: Iterable[Tuple[int, str, str]],
+                       batch_size: int = 1000,
+                       progress: Callable[[int, int], None] = None) -> dict:
+        """Registers (line, email, password) rows in chunks of batch_size
+
+        Each chunk costs one duplicate query, a parallel hash of its
+        passwords and one bulk insert and commit. If the insert collides
+        with a concurrent registration, the taken emails are rejected and
+        the rest of the chunk is inserted again. Returns the number of
+        users created and the rejected rows as (line, email, reason).
+        """
+        report = {"created": 0, "rejected": []}
+        seen = 0
+        reported = 0
+        chunk = []
+
+        def _flush() -> None:
+            emails = [email for _, email, _ in chunk]
+            existing = self._db.existing_emails(emails)
+            accepted = []
+            for line, email, password in chunk:
+                if email in existing:
+                    report["rejected"].append(
+                        (line, email, "email already registered"))
+                    continue
+                existing.add(email)
+                accepted.append((line, email, password))
+            hashed = HASHER.hash_many(
+                [password.encode() for _, _, password in accepted])
+            rows = [(line, email, hashed_password) for (line, email, _),
+                    hashed_password in zip(accepted, hashed)]
+            chunk.clear()
+            while rows:
+                try:
+                    self._db.add_users([
+                        {"email": email, "hashed_password": hashed_password}
+                        for _, email, hashed_password in rows])
+                    break
+                except IntegrityError:
+                    taken = self._db.existing_emails(
+                        [email for _, email, _ in rows])
+                    reason = "email already registered"
+                    if not taken:
+                        taken = {email for _, email, _ in rows}
+                        reason = "insert failed"
+                    report["rejected"].extend(
+                        (line, email, reason)
+                        for line, email, _ in rows if email in taken)
+                    rows = [row for row in rows if row[1] not in taken]
+            report["created"] += len(rows)
+
+        for line, email, password in users:
+            seen += 1
+            if not email or not password:
+                report["rejected"].append(
+                    (line, email, "email or password missing"))
+                continue
+            if not isinstance(email, str) or not isinstance(password, str):
+                report["rejected"].append(
+                    (line, email, "email or password is not a string"))
+                continue
+            chunk.append((line, email, password))
+            if len(chunk) >= batch_size:
+                _flush()
+                if progress is not None:
+                    progress(seen, report["created"])
+                    reported = seen
+        if chunk:
+            _flush()
+        if progress is not None and seen != reported:
+            progress(seen, report["created"])
+        return report
+
     def valid_login(self, email: str, password: str) -> bool:
         """Checks if the provided email and password
+        A hash stored at a stale bcrypt cost is upgraded in the background
         """
         try:
             user = self._db.find_user_by(email=email)
-            is_valid_password = bcrypt.checkpw(password.encode(),
+            is_valid_password = HASHER.checkpw(password.encode(),
                                                user.hashed_password)
+            if is_valid_password and HASHER.needs_rehash(
+                    user.hashed_password):
+                self._rehash(user.id, password, user.hashed_password)
             return is_valid_password
         except NoResultFound:
             return False
 
+    def _rehash(self, user_id: int, password: str,
+                old_hash: bytes) -> None:
+        """Rehashes a user's password at the current cost, off-thread
+        The new hash is only stored if the password is still `old_hash`,
+        so a password changed in the meantime is never overwritten
+        """
+        def _store(hashed_password: bytes) -> None:
+            try:
+                self._db.update_user_by(
+                    {"id": user_id, "hashed_password": old_hash},
+                    hashed_password=hashed_password)
+            finally:
+                self._db.close_session()
+
+        HASHER.rehash_async(password.encode(), _store)
+
     def create_session(self, email: str = None) -> str:
         """Creates a new session for a user and returns the session ID
         """
         if email is None:
             return None
-        try:
-            user = self._db.find_user_by(email=email)
-            session_id = _generate_uuid()
-            self._db.update_user(user.id, session_id=session_id)
-            return session_id
-        except NoResultFound:
+        session_id = _generate_uuid()
+        if not self._db.update_user_by({"email": email},
+                                       session_id=session_id):
             return None
+        self._cache.set(f"email:{email}", session_id)
+        return session_id
 
     def get_user_from_session_id(self, session_id: str = None) -> str:
         """Find a user by their session ID
+        Reads through the session cache; cached users are detached copies
+        holding only id, email and session_id. A miss fills the cache with
+        add(), so a lookup that overlapped a login or logout cannot
+        overwrite what they stored.
         """
         if session_id is None:
             return None
 
+        cached = self._cache.get(f"session:{session_id}")
+        if cached is False:
+            self.cache_stats["hits"] += 1
+            return None
+        if (cached is not None and
+                self._cache.get(f"email:{cached['email']}") == session_id):
+            self.cache_stats["hits"] += 1
+            return User(**cached)
+        self.cache_stats["misses"] += 1
+
         try:
             user = self._db.find_user_by(session_id=session_id)
-            return user
         except NoResultFound:
             return None
+        cached = {"id": user.id, "email": user.email, "session_id": session_id}
+        email_key = f"email:{user.email}"
+        if (self._cache.add(email_key, session_id) or
+                self._cache.get(email_key) == session_id):
+            self._cache.add(f"session:{session_id}", cached)
+        return User(**cached)
 
-    def destroy_session(self, user_id: int = None) -> None:
+    def destroy_session(self, user_id: int = None,
+                        session_id: str = None) -> None:
         """Destroy a user's session by updating their session ID to None
+        With `session_id`, only that session is destroyed and its cache
+        entry is replaced by a False tombstone
         """
         if user_id is None:
             return None
 
-        try:
+        if session_id is None:
+            try:
+                email = self._db.find_user_by(id=user_id).email
+            except NoResultFound:
+                return None
             self._db.update_user(user_id, session_id=None)
-        except ValueError:
+            self._cache.set(f"email:{email}", "")
             return None
+        self._db.update_user_by({"id": user_id, "session_id": session_id},
+                                session_id=None)
+        self._cache.set(f"session:{session_id}", False)
 
     def get_reset_password_token(self, email: str) -> str:
         """Generate a reset password token for a user
         """
-        try:
-            user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            raise ValueError
-
         reset_token = _generate_uuid()
-        self._db.update_user(user.id, reset_token=reset_token)
+        if not self._db.update_user_by({"email": email},
+                                       reset_token=reset_token):
+            raise ValueError
 
         return reset_token
 
     def update_password(self, reset_token: str, password: str) -> None:
         """Update a user's password with the provided reset token
+        Cached users hold neither password nor reset token, so no cached
+        session goes stale here. The token is looked up before hashing, so
+        an unknown token costs an indexed query and no bcrypt work; the
+        UPDATE only applies if the token is still unused.
         """
+        if reset_token is None:
+            raise ValueError
+
         try:
-            user = self._db.find_user_by(reset_token=reset_token)
+            user_id = self._db.find_user_by(reset_token=reset_token).id
         except NoResultFound:
             raise ValueError
-
         hashed_password = _hash_password(password)
-        self._db.update_user(user.id, hashed_password=hashed_password,
-                             reset_token=None)
+        if not self._db.update_user_by({"id": user_id,
+                                        "reset_token": reset_token},
+                                       hashed_password=hashed_password,
+                                       reset_token=None):
+            raise ValueError
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Bulk user import from a CSV or JSONL file
+
+Usage: ./bulk_import.py users.csv [--format csv|jsonl] [--batch-size N]
+                                  [--rejects rejects.csv]
+Each record needs an email and a password (CSV header or JSON keys).
+The import always runs against a persistent database (DB_PERSISTENT).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Iterator, Tuple
+from auth import Auth
+
+
+def read_users(path: str, fmt: str = None) -> Iterator[Tuple[int, str, str]]:
+    """Streams (row, email, password) records from a CSV or JSONL file
+    JSONL values are passed on as decoded, so a non-string email or
+    password is rejected by Auth.register_users like a missing one
+    """
+    if fmt is None:
+        fmt = "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(f), 1):
+                yield number, row.get("email"), row.get("password")
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                yield number, None, None
+                continue
+            yield number, record.get("email"), record.get("password")
+
+
+def main() -> None:
+    """Imports users and reports progress and rejected rows
+    """
+    parser = argparse.ArgumentParser(description="Bulk user import")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rejects", help="write rejected rows to this CSV")
+    args = parser.parse_args()
+
+    def progress(seen: int, created: int) -> None:
+        print(f"{seen} rows read, {created} users created",
+              file=sys.stderr)
+
+    os.environ.setdefault("DB_PERSISTENT", "1")
+    report = Auth().register_users(read_users(args.path, args.format),
+                                   args.batch_size, progress)
+
+    rejected = report["rejected"]
+    print(f"{report['created']} users created, {len(rejected)} rejected")
+    if args.rejects:
+        with open(args.rejects, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("row", "email", "reason"))
+            writer.writerows(rejected)
+    else:
+        for row, email, reason in rejected:
+            print(f"row {row}: {email}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Cache module
+
+A cache backend is any object with get(key), set(key, value),
+add(key, value) and delete(key); values are JSON-serializable so a
+shared cache can hold them. add() only stores a value if the key is
+absent and returns whether it did, like memcached's add.
+"""
+from collections import OrderedDict
+import json
+import threading
+import time
+
+
+class LRUCache:
+    """Bounded in-process cache with a per-entry TTL and LRU eviction
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0) -> None:
+        """Initialize an empty cache
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        """Store a value, evicting the least recently used entries
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._put(key, value)
+
+    def add(self, key: str, value) -> bool:
+        """Store a value only if the key is missing or expired
+        Returns whether it was stored
+        """
+        if self.maxsize <= 0:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] >= time.monotonic():
+                return False
+            self._put(key, value)
+            return True
+
+    def _put(self, key: str, value) -> None:
+        """Store a value and evict down to maxsize; the lock must be held
+        """
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Drop a key if present
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DictCache:
+    """Local stand-in for a shared cache such as memcached
+
+    Values round-trip through JSON, as they would over the wire, and
+    instances built on the same `store` dict see each other's writes.
+    """
+
+    def __init__(self, store: dict = None) -> None:
+        """Initialize the cache on a (possibly shared) dict
+        """
+        self.store = store if store is not None else {}
+
+    def get(self, key: str):
+        """Return the cached value, or None
+        """
+        raw = self.store.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: str, value) -> None:
+        """Store a value
+        """
+        self.store[key] = json.dumps(value)
+
+    def add(self, key: str, value) -> bool:
+        """Store a value only if the key is missing
+        Returns whether it was stored
+        """
+        raw = json.dumps(value)
+        return self.store.setdefault(key, raw) is raw
+
+    def delete(self, key: str) -> None:
+        """Drop a key if present
+        """
+        self.store.pop(key, None)
@@ -1,12 +1,77 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
+from os import getenv
+from typing import List, Set
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.pool import QueuePool
 from user import Base, User
+import logging
+
+
+logger = logging.getLogger(__name__)
+USER_COLUMNS = frozenset(User.__table__.columns.keys())
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Enable WAL and a busy timeout on every new SQLite connection
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout={}".format(
+        int(float(getenv("DB_BUSY_TIMEOUT", 30)) * 1000)))
+    cursor.close()
+
+
+def create_schema(bind) -> None:
+    """Create the schema on an engine or connection
+    Unless DB_PERSISTENT is set, existing tables are dropped first.
+    create_all() skips existing tables, so indexes missing from a
+    database made by an older schema are added separately. A unique
+    index whose column already holds duplicates is skipped and the
+    duplicates are logged, instead of failing at startup.
+    """
+    if getenv("DB_PERSISTENT", "").lower() not in ("1", "true", "yes"):
+        Base.metadata.drop_all(bind)
+        Base.metadata.create_all(bind)
+        return
+    Base.metadata.create_all(bind)
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"]
+                    for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                duplicates = _duplicates(bind, index)
+                if duplicates:
+                    logger.error(
+                        "not creating unique index %s: %s",
+                        index.name, ", ".join(
+                            f"{', '.join(map(str, values))} ({count} rows)"
+                            for *values, count in duplicates))
+                    continue
+            index.create(bind)
+
+
+def _duplicates(bind, index, limit: int = 10) -> list:
+    """Up to `limit` duplicated values of an index's columns, each row
+    being the column values followed by the number of rows holding them
+    """
+    columns = list(index.columns)
+    query = select(*columns, func.count()).group_by(*columns).having(
+        func.count() > 1).limit(limit)
+    if isinstance(bind, Engine):
+        with bind.connect() as connection:
+            return connection.execute(query).fetchall()
+    return bind.execute(query).fetchall()
 
 
 class DB:
@@ -15,29 +80,71 @@ class DB:
 
     def __init__(self) -> None:
         """Initialize a new DB instance
+        The database URL comes from DB_URL (default sqlite:///a.db). With
+        DB_PERSISTENT set, existing data is kept and only missing tables
+        and indexes are created; otherwise the schema is rebuilt empty.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        url = getenv("DB_URL", "sqlite:///a.db")
+        engine_args = {
+            "poolclass": QueuePool,
+            "pool_size": int(getenv("DB_POOL_SIZE", 5)),
+            "max_overflow": int(getenv("DB_MAX_OVERFLOW", 10)),
+        }
+        if url.startswith("sqlite"):
+            engine_args["connect_args"] = {
+                "check_same_thread": False,
+                "timeout": float(getenv("DB_BUSY_TIMEOUT", 30))}
+        self._engine = create_engine(url, echo=False, **engine_args)
+        if url.startswith("sqlite"):
+            event.listen(self._engine, "connect", _set_sqlite_pragmas)
+        create_schema(self._engine)
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object
+        """Session object scoped to the current thread
+        """
+        return self.__session()
+
+    def close_session(self) -> None:
+        """Close the current thread's session, e.g. at request teardown
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Add a new user to the database
         """
         new_user = User(email=email, hashed_password=hashed_password)
         self._session.add(new_user)
-        self._session.commit()
+        try:
+            self._session.commit()
+        except IntegrityError:
+            self._session.rollback()
+            raise
         return new_user
 
+    def add_users(self, users: List[dict]) -> None:
+        """Bulk insert users (dicts of email and hashed_password)
+        in a single executemany and commit
+        """
+        if not users:
+            return
+        try:
+            self._session.bulk_insert_mappings(User, users)
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+
+    def existing_emails(self, emails: List[str]) -> Set[str]:
+        """Return which of the given emails are already registered
+        """
+        if not emails:
+            return set()
+        rows = self._session.query(User.email).filter(
+            User.email.in_(emails)).all()
+        return {row[0] for row in rows}
+
     def find_user_by(self, **kwargs) -> User:
         """Find a user in the database based on provided keyword arguments
         """
@@ -46,13 +153,28 @@ class DB:
             raise NoResultFound
         return user
 
-    def update_user(self, user_id: int, **kwargs) -> None:
-        """Update a user's attributes
+    def update_user(self, user_id: int, **kwargs) -> bool:
+        """Update a user's attributes with a single UPDATE statement
+        Returns whether a user matched
+        """
+        return self.update_user_by({"id": user_id}, **kwargs)
+
+    def update_user_by(self, criteria: dict, **kwargs) -> bool:
+        """Update the user matching `criteria` in a single UPDATE statement
+        Returns whether a user matched; a None criterion never matches
         """
-        user = self.find_user_by(id=user_id)
-        for key, value in kwargs.items():
-            if hasattr(user, key):
-                setattr(user, key, value)
-            else:
+        for key in kwargs:
+            if key not in USER_COLUMNS:
                 raise ValueError
-        self.__session.commit()
+        if not kwargs:
+            return False
+        if not criteria or any(value is None for value in criteria.values()):
+            return False
+        try:
+            matched = self._session.query(User).filter_by(
+                **criteria).update(kwargs)
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+        return matched > 0
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Hasher module
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import asyncio
+import bcrypt
+import logging
+import os
+import threading
+import time
+from typing import List
+
+
+logger = logging.getLogger(__name__)
+
+
+def calibrate_rounds(target: float = 0.25, min_rounds: int = 12,
+                     max_rounds: int = 16) -> int:
+    """Returns the largest bcrypt cost whose hash takes about `target`
+    seconds on this machine, clamped to [min_rounds, max_rounds]
+
+    Each extra round doubles the work, so one hash at a cheap cost is
+    timed and extrapolated. min_rounds defaults to bcrypt's own default
+    cost, so calibration never weakens hashes; BCRYPT_ROUNDS can still
+    pin a lower cost.
+    """
+    probe = 6
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(probe))
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    rounds = probe
+    while elapsed * 2 ** (rounds + 1 - probe) <= target:
+        rounds += 1
+    return max(min_rounds, min(max_rounds, rounds))
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """Returns the cost a bcrypt hash was computed with, or 0
+    """
+    try:
+        return int(hashed_password.split(b"$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+class HashingUnavailable(Exception):
+    """Raised when a hash cannot be computed in time
+    """
+
+
+class HashingPool:
+    """Runs bcrypt off the request thread on a bounded worker pool
+
+    bcrypt releases the GIL while hashing, so plain threads hash in
+    parallel. At most `max_pending` calls may be queued or running;
+    further calls fail fast with HashingUnavailable instead of stalling,
+    as do calls that take longer than `timeout` seconds.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 64,
+                 timeout: float = 5.0, rounds: int = None) -> None:
+        """Initialize the worker pool
+
+        `rounds` is the bcrypt cost for new hashes, calibrated with
+        calibrate_rounds() when not given.
+        """
+        self.timeout = timeout
+        self.rounds = rounds if rounds else calibrate_rounds()
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {"completed": 0, "rejected": 0, "timeouts": 0,
+                       "total_latency": 0.0, "last_latency": 0.0}
+
+    def _submit(self, func, *args):
+        """Submits func(*args) to the pool and returns its future
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise HashingUnavailable("hashing queue is full")
+        with self._lock:
+            self._pending += 1
+        start = time.perf_counter()
+
+        def _done(future):
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._pending -= 1
+                self._stats["completed"] += 1
+                self._stats["total_latency"] += latency
+                self._stats["last_latency"] = latency
+            self._slots.release()
+
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(_done)
+        return future
+
+    def _run(self, func, *args):
+        """Runs func(*args) on the pool and returns its result
+        """
+        future = self._submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise HashingUnavailable("hashing timed out")
+
+    def hashpw(self, password: bytes, salt: bytes) -> bytes:
+        """bcrypt.hashpw on the pool
+        """
+        return self._run(bcrypt.hashpw, password, salt)
+
+    def checkpw(self, password: bytes, hashed_password: bytes) -> bool:
+        """bcrypt.checkpw on the pool
+        """
+        return self._run(bcrypt.checkpw, password, hashed_password)
+
+    async def _run_async(self, func, *args):
+        """Awaits func(*args) on the pool without blocking the event loop
+        """
+        future = self._submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future),
+                                          self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise HashingUnavailable("hashing timed out")
+
+    async def hashpw_async(self, password: bytes, salt: bytes) -> bytes:
+        """bcrypt.hashpw on the pool, for asyncio callers
+        """
+        return await self._run_async(bcrypt.hashpw, password, salt)
+
+    async def checkpw_async(self, password: bytes,
+                            hashed_password: bytes) -> bool:
+        """bcrypt.checkpw on the pool, for asyncio callers
+        """
+        return await self._run_async(bcrypt.checkpw, password,
+                                     hashed_password)
+
+    def gensalt(self) -> bytes:
+        """bcrypt salt at the calibrated cost
+        """
+        return bcrypt.gensalt(self.rounds)
+
+    def needs_rehash(self, hashed_password: bytes) -> bool:
+        """Whether a hash was computed at a lower cost than self.rounds
+        Stronger hashes are kept, so workers calibrated differently never
+        rewrite each other's hashes
+        """
+        return hash_rounds(hashed_password) < self.rounds
+
+    def rehash_async(self, password: bytes, callback) -> bool:
+        """Hashes password at the current cost in the background and
+        calls callback(new_hash) on a pool thread once done
+
+        Returns False, without queueing, when the pool is saturated.
+        Errors raised by the hash or the callback are logged.
+        """
+        def _rehash():
+            callback(bcrypt.hashpw(password, self.gensalt()))
+
+        def _report(future):
+            error = future.exception()
+            if error is not None:
+                logger.error("background rehash failed", exc_info=error)
+
+        try:
+            future = self._submit(_rehash)
+        except HashingUnavailable:
+            return False
+        future.add_done_callback(_report)
+        return True
+
+    def hash_many(self, passwords: List[bytes], workers: int = None
+                  ) -> List[bytes]:
+        """Hashes a batch of passwords in parallel at the current cost
+
+        Uses its own short-lived threads so bulk jobs never take slots
+        from request traffic.
+        """
+        workers = workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(
+                lambda password: bcrypt.hashpw(password, self.gensalt()),
+                passwords))
+
+    def stats(self) -> dict:
+        """Returns queue depth and hash latency counters
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+        completed = stats["completed"]
+        stats["avg_latency"] = (stats["total_latency"] / completed
+                                if completed else 0.0)
+        return stats
+
+
+HASHER = HashingPool(
+    workers=int(os.getenv("HASH_WORKERS", os.cpu_count() or 1)),
+    max_pending=int(os.getenv("HASH_QUEUE_SIZE", 64)),
+    timeout=float(os.getenv("HASH_TIMEOUT", 5)),
+    rounds=(int(os.getenv("BCRYPT_ROUNDS", 0)) or
+            calibrate_rounds(float(os.getenv("BCRYPT_TARGET_MS", 250)) /
+                             1000)),
+)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Lookup latency of DB.find_user_by with and without the users indexes
+
+Fills a scratch SQLite database with N users (each with a session_id
+and a reset_token), then times random find_user_by() lookups on email,
+session_id and reset_token, first without the indexes (as before they
+existed) and then with them:
+
+    ./lookup_benchmark.py --users 1000000 --lookups 200 --output lookup.json
+"""
+from sqlalchemy import text
+from db import DB
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+COLUMNS = ("email", "session_id", "reset_token")
+
+
+def seed(path: str, users: int, batch_size: int = 100000) -> None:
+    """Writes `users` rows straight into the users table
+    Values are derived from the row number, see value()
+    """
+    connection = sqlite3.connect(path)
+    with connection:
+        for start in range(0, users, batch_size):
+            connection.executemany(
+                "INSERT INTO users (email, hashed_password, session_id,"
+                " reset_token) VALUES (?, ?, ?, ?)",
+                ((value("email", i), "x" * 60, value("session_id", i),
+                  value("reset_token", i))
+                 for i in range(start, min(start + batch_size, users))))
+    connection.close()
+
+
+def value(column: str, i: int) -> str:
+    """Value of a column for the i-th seeded user
+    """
+    if column == "email":
+        return f"user{i}@bench.local"
+    return f"{column}-{i:032x}"
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1,
+                max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def measure(db, users: int, lookups: int) -> dict:
+    """Times `lookups` random find_user_by() calls per column
+    """
+    results = {}
+    for column in COLUMNS:
+        latencies = []
+        for _ in range(lookups):
+            wanted = value(column, random.randrange(users))
+            start = time.perf_counter()
+            db.find_user_by(**{column: wanted})
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        results[column] = {
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "mean_ms": sum(latencies) / len(latencies) * 1000,
+        }
+    return results
+
+
+def main() -> None:
+    """Seeds the database, runs both passes and reports them
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=200,
+                        help="lookups per column and pass")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        os.environ["DB_URL"] = f"sqlite:///{path}"
+        os.environ["DB_PERSISTENT"] = "1"
+        db = DB()
+        print(f"seeding {args.users} users", file=sys.stderr)
+        seed(path, args.users)
+        with db._engine.begin() as connection:
+            for column in COLUMNS:
+                connection.execute(text(f"DROP INDEX ix_users_{column}"))
+        before = measure(db, args.users, args.lookups)
+        db.close_session()
+
+        after = measure(DB(), args.users, args.lookups)
+
+    print(f"{'column':<12} {'before p50':>11} {'before p99':>11} "
+          f"{'after p50':>10} {'after p99':>10}  (ms)")
+    for column in COLUMNS:
+        print(f"{column:<12} {before[column]['p50_ms']:>11.3f} "
+              f"{before[column]['p99_ms']:>11.3f} "
+              f"{after[column]['p50_ms']:>10.3f} "
+              f"{after[column]['p99_ms']:>10.3f}")
+
+    if args.output:
+        report = {
+            "meta": {"users": args.users, "lookups": args.lookups,
+                     "python": platform.python_version()},
+            "before": before, "after": after,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 #!/usr/bin/env python3
 """
 End-to-end integration test for the User Authentication Service
+
+Runs against a server on localhost:5000 with an empty database. The
+last check logs out under session cache eviction, which only happens
+with a small cache, so start the server for it with e.g.:
+
+    SESSION_CACHE_SIZE=4 python3 app.py
 """
 import requests
 
@@ -100,6 +106,28 @@ def update_password(email: str, reset_token: str, new_password: str) -> None:
     )
 
 
+def log_out_under_eviction(session_id: str, users: int = 8) -> None:
+    """Log out while other sessions keep the session cache full
+    Run the server with a small cache (e.g. SESSION_CACHE_SIZE=4): the
+    session stays hot while everything cached around it is evicted, and
+    must still be refused right after the log out
+    """
+    for i in range(users):
+        email = f"evict{i}@holberton.io"
+        register_user(email, PASSWD)
+        other_session_id = log_in(email, PASSWD)
+        profile_logged(session_id)
+        profile_logged(other_session_id)
+        profile_logged(session_id)
+    log_out(session_id)
+    cookies = {"session_id": session_id}
+    response = requests.get(f"{BASE_URL}/profile", cookies=cookies)
+    assert response.status_code == 403, (
+        f"Profile after log out under eviction returned status code: "
+        f"{response.status_code}"
+    )
+
+
 if __name__ == "__main__":
     register_user(EMAIL, PASSWD)
     log_in_wrong_password(EMAIL, NEW_PASSWD)
@@ -109,4 +137,5 @@ if __name__ == "__main__":
     log_out(session_id)
     reset_token = reset_password_token(EMAIL)
     update_password(EMAIL, reset_token, NEW_PASSWD)
-    log_in(EMAIL, NEW_PASSWD)
+    session_id = log_in(EMAIL, NEW_PASSWD)
+    log_out_under_eviction(session_id)
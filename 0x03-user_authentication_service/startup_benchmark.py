@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Startup time of DB() on an empty database and on a large existing one
+
+For each scenario, times DB() until a first find_user_by() answers:
+- empty: first start on a missing database file (schema is created)
+- existing: restart on a database of N users (schema is kept)
+- migrate: restart on N users whose indexes are missing
+- rebuild: restart without DB_PERSISTENT (drop_all + create_all, as
+  every start did before the persistent mode)
+
+    ./startup_benchmark.py --users 1000000 --repeat 5 --output startup.json
+"""
+from sqlalchemy import text
+from sqlalchemy.orm.exc import NoResultFound
+from db import DB
+from lookup_benchmark import COLUMNS, seed
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+
+def start(url: str, persistent: bool) -> float:
+    """Seconds until a new DB() on `url` answers a lookup
+    """
+    os.environ["DB_URL"] = url
+    os.environ["DB_PERSISTENT"] = "1" if persistent else ""
+    began = time.perf_counter()
+    db = DB()
+    try:
+        db.find_user_by(email="user0@bench.local")
+    except NoResultFound:
+        pass
+    elapsed = time.perf_counter() - began
+    db.close_session()
+    db._engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    """Seeds a database, times every scenario and reports them
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    scenarios = {"empty": [], "existing": [], "migrate": [], "rebuild": []}
+    with tempfile.TemporaryDirectory() as directory:
+        large = os.path.join(directory, "large.db")
+        start(f"sqlite:///{large}", True)
+        print(f"seeding {args.users} users", file=sys.stderr)
+        seed(large, args.users)
+        start(f"sqlite:///{large}", True)
+
+        for i in range(args.repeat):
+            empty = os.path.join(directory, f"empty{i}.db")
+            scenarios["empty"].append(start(f"sqlite:///{empty}", True))
+            scenarios["existing"].append(start(f"sqlite:///{large}", True))
+
+            copy = os.path.join(directory, "copy.db")
+            shutil.copyfile(large, copy)
+            os.environ["DB_URL"] = f"sqlite:///{copy}"
+            os.environ["DB_PERSISTENT"] = "1"
+            db = DB()
+            with db._engine.begin() as connection:
+                for column in COLUMNS:
+                    connection.execute(
+                        text(f"DROP INDEX ix_users_{column}"))
+            db._engine.dispose()
+            scenarios["migrate"].append(start(f"sqlite:///{copy}", True))
+
+            shutil.copyfile(large, copy)
+            scenarios["rebuild"].append(start(f"sqlite:///{copy}", False))
+            os.remove(copy)
+
+    results = {name: {"median_s": statistics.median(times),
+                      "min_s": min(times), "max_s": max(times)}
+               for name, times in scenarios.items()}
+    print(f"{'scenario':<10} {'median s':>10} {'min s':>10} {'max s':>10}")
+    for name, row in results.items():
+        print(f"{name:<10} {row['median_s']:>10.4f} {row['min_s']:>10.4f} "
+              f"{row['max_s']:>10.4f}")
+
+    if args.output:
+        report = {
+            "meta": {"users": args.users, "repeat": args.repeat,
+                     "python": platform.python_version()},
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()